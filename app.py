@@ -5,19 +5,32 @@ Versión: 2.0 Professional Edition
 Arquitectura: MVC + Repository Pattern + Security Layer
 """
 
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, stream_with_context, g
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask_compress import Compress
+from werkzeug.middleware.proxy_fix import ProxyFix
+from collections import OrderedDict
 from functools import wraps
+from itertools import chain
+import atexit
+import csv
 import logging
 import os
+import queue
+import threading
+import time
+import zlib
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
 # Importaciones locales
 from modulos.gestor_datos import DatabaseManager
+from modulos.seguridad import CacheVerificacion, generar_hash
+from modulos.cache import CacheTTL
+from modulos.serializacion import ORJSONProvider
 from config import config
 
 # ============================================================================
@@ -30,30 +43,69 @@ app = Flask(__name__)
 env = os.environ.get('FLASK_ENV', 'development')
 app.config.from_object(config[env])
 
+# Confiar en un proxy inverso (nginx): remote_addr y scheme ya llegan corregidos
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+
+# Serialización JSON con orjson (jsonify, request.get_json y filtro tojson)
+app.json = ORJSONProvider(app)
+
+# Valores derivados de la configuración, precalculados una sola vez
+MODOS_VALIDOS = app.config['MODOS_VALIDOS']
+MODOS_VALIDOS_STR = app.config['MODOS_VALIDOS_STR']
+CONFIG_FROZEN = {
+    modo: (cfg['modo_actual'], cfg['carga_cpu'], cfg['latencia'], cfg['detalles'])
+    for modo, cfg in app.config['CONFIGURACIONES_MODOS'].items()
+}
+
 # Configuración de logging profesional
 if not os.path.exists('logs'):
     os.makedirs('logs')
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler('logs/sistema.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Las peticiones sólo encolan el registro; un hilo del QueueListener escribe en disco y consola
+formato_log = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+manejadores_log = [
+    logging.FileHandler('logs/sistema.log', encoding='utf-8'),
+    logging.StreamHandler()
+]
+for manejador in manejadores_log:
+    manejador.setFormatter(formato_log)
+
+cola_logs = queue.SimpleQueue()
+log_listener = QueueListener(cola_logs, *manejadores_log, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logging.root.setLevel(logging.INFO)
+logging.root.addHandler(QueueHandler(cola_logs))
 logger = logging.getLogger(__name__)
 
 # ============================================================================
 # INYECCIÓN DE DEPENDENCIAS
 # ============================================================================
 
-db = DatabaseManager(app.config['DATABASE_PATH'])
+# Los eventos de auditoría se persisten por lotes fuera del ciclo de la petición
+db = DatabaseManager(
+    app.config['DATABASE_PATH'],
+    batch_size=app.config['AUDITORIA_BATCH_SIZE'],
+    batch_ms=app.config['AUDITORIA_BATCH_MS'],
+    estado_ttl=app.config['CACHE_TTL_ESTADO']
+)
+
+# Caché de lecturas consultadas por polling (timeline, estadísticas)
+cache = CacheTTL()
 
 # ============================================================================
 # CONFIGURACIÓN DE SEGURIDAD
 # ============================================================================
 
+# Sesiones del lado del servidor (Redis) cuando el entorno lo configura
+if app.config['SESSION_TYPE'] == 'redis':
+    import redis
+    from flask_session import Session
+    
+    app.config['SESSION_REDIS'] = redis.Redis.from_url(app.config['SESSION_REDIS_URL'])
+    Session(app)
+
 # Flask-Login para autenticación
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -65,43 +117,93 @@ limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     storage_uri=app.config['RATELIMIT_STORAGE_URL'],
+    strategy=app.config['RATELIMIT_STRATEGY'],
+    headers_enabled=app.config['RATELIMIT_HEADERS_ENABLED'],
     default_limits=app.config['RATELIMIT_DEFAULT'].split(';') if app.config['RATELIMIT_ENABLED'] else []
 )
 
+# Compresión de respuestas (Brotli con fallback a gzip) según Accept-Encoding
+Compress(app)
+
+# Caché de verificaciones de contraseña para amortizar el costo del KDF
+verificador_passwords = CacheVerificacion(
+    app.config['SECRET_KEY'],
+    maxsize=app.config['PASSWORD_CACHE_SIZE'],
+    ttl=app.config['PASSWORD_CACHE_TTL']
+)
+
 # ============================================================================
 # MODELO DE USUARIO
 # ============================================================================
 
 class Usuario(UserMixin):
-    """Modelo de usuario para Flask-Login"""
-    def __init__(self, username: str):
+    """Modelo de usuario para Flask-Login (el rol se carga una vez por petición)"""
+    def __init__(self, username: str, rol: Optional[str] = None):
         self.id = username
         self.username = username
+        self.rol = rol
 
 @login_manager.user_loader
 def cargar_usuario(username: str) -> Optional[Usuario]:
     """Callback requerido por Flask-Login"""
-    if username in app.config['USUARIOS_VALIDOS']:
-        return Usuario(username)
+    usuario = db.obtener_usuario(username)
+    if usuario and usuario['activo']:
+        return Usuario(username, usuario['rol'])
     return None
 
 # ============================================================================
 # FUNCIONES AUXILIARES
 # ============================================================================
 
+@app.before_request
+def capturar_cliente() -> None:
+    """
+    Resuelve una sola vez por petición la IP y el user-agent del cliente.
+    ProxyFix ya aplicó X-Forwarded-For sobre remote_addr.
+    """
+    g.client_ip = request.remote_addr or "0.0.0.0"
+    g.user_agent = request.headers.get('User-Agent', 'Unknown')
+
 def obtener_ip_real() -> str:
+    """Obtiene la IP real del cliente, incluso detrás de proxies"""
+    return g.client_ip
+
+def etag_vigente(etag: str) -> bool:
     """
-    Obtiene la IP real del cliente, incluso detrás de proxies.
-    Maneja headers X-Forwarded-For de manera segura.
+    Indica si el cliente ya tiene la versión identificada por `etag`.
+    flask-compress agrega ':<algoritmo>' a la ETag de las respuestas comprimidas,
+    por lo que se aceptan ambas formas.
     """
-    if request.headers.get('X-Forwarded-For'):
-        # Toma la primera IP (la del cliente original)
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    return request.remote_addr or "0.0.0.0"
+    cabecera = request.headers.get('If-None-Match')
+    if not cabecera:
+        return False
+    return f'"{etag}"' in cabecera or f'"{etag}:' in cabecera
+
+def con_etag(respuesta: Response, etag: str) -> Response:
+    """Adjunta una ETag débil y obliga al navegador a revalidar en cada consulta"""
+    respuesta.set_etag(etag, weak=True)
+    respuesta.cache_control.no_cache = True
+    return respuesta
+
+def no_modificado(etag: str) -> Response:
+    """Respuesta 304 sin cuerpo para un recurso que no cambió"""
+    return con_etag(Response(status=304), etag)
 
-def validar_modo(modo: str) -> bool:
-    """Valida que el modo solicitado sea válido"""
-    return modo.upper() in app.config['MODOS_VALIDOS']
+class _EchoBuffer:
+    """Adaptador para csv.writer: devuelve cada línea en lugar de almacenarla"""
+    def write(self, valor: str) -> str:
+        return valor
+
+# Máximo de registros por página del historial y de la búsqueda de logs
+LIMITE_MAXIMO = 100
+
+def acotar_limite(limite: int) -> int:
+    """Acota el tamaño de página a [1, LIMITE_MAXIMO] (en SQLite un LIMIT negativo no tiene tope)"""
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+def validar_modo(modo: Any) -> bool:
+    """Valida que el modo solicitado sea válido (un valor que no es texto nunca lo es)"""
+    return isinstance(modo, str) and modo.upper() in MODOS_VALIDOS
 
 def registrar_accion(
     evento: str,
@@ -113,20 +215,13 @@ def registrar_accion(
     """
     Wrapper para registrar eventos con contexto completo.
     Captura automáticamente IP, usuario y user-agent.
+    El evento se encola y se persiste en segundo plano por lotes.
     """
     usuario = current_user.username if current_user.is_authenticated else "anónimo"
-    ip = obtener_ip_real()
-    user_agent = request.headers.get('User-Agent', 'Unknown')
     
     db.registrar_evento(
-        evento=evento,
-        detalles=detalles,
-        ip=ip,
-        nivel=nivel,
-        usuario=usuario,
-        estado_previo=estado_previo,
-        estado_nuevo=estado_nuevo,
-        user_agent=user_agent
+        evento, detalles, g.client_ip, nivel, usuario,
+        estado_previo, estado_nuevo, g.user_agent
     )
 
 # ============================================================================
@@ -140,8 +235,13 @@ def requiere_confirmacion(f):
     """
     @wraps(f)
     def decorador(*args, **kwargs):
-        confirmado = request.json.get('confirmado', False) if request.json else False
-        if not confirmado and request.json.get('modo') == 'OFF':
+        # Se parsea el cuerpo una sola vez; el endpoint lo reutiliza desde g
+        data = request.get_json(silent=True)
+        g.datos = data = data if isinstance(data, dict) else {}
+        if data.get('confirmado'):
+            return f(*args, **kwargs)
+        modo = data.get('modo')
+        if isinstance(modo, str) and modo.upper() == 'OFF':
             return jsonify({
                 "status": "confirmation_required",
                 "msg": "Esta acción requiere confirmación explícita.",
@@ -150,6 +250,23 @@ def requiere_confirmacion(f):
         return f(*args, **kwargs)
     return decorador
 
+# Rol con acceso al panel y a /api/admin/*
+ROL_ADMIN = 'admin'
+
+def role_required(rol: str):
+    """
+    Decorador que restringe un endpoint a usuarios con el rol indicado.
+    Debe aplicarse debajo de @login_required.
+    """
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            if getattr(current_user, 'rol', None) != rol:
+                return jsonify({"error": "Acceso denegado"}), 403
+            return f(*args, **kwargs)
+        return envoltura
+    return decorador
+
 # ============================================================================
 # RUTAS DE AUTENTICACIÓN
 # ============================================================================
@@ -174,10 +291,11 @@ def login():
             registrar_accion("LOGIN_FALLIDO", "Credenciales incompletas", nivel="WARNING")
             return jsonify({"error": "Usuario y contraseña requeridos"}), 400
         
-        # Verificación de credenciales
-        if username in app.config['USUARIOS_VALIDOS']:
-            if app.config['USUARIOS_VALIDOS'][username] == password:
-                user = Usuario(username)
+        # Verificación de credenciales contra el hash almacenado
+        usuario = db.obtener_usuario(username)
+        if usuario and usuario['activo']:
+            if verificador_passwords.verificar(username, password, usuario['password_hash']):
+                user = Usuario(username, usuario['rol'])
                 login_user(user)
                 session.permanent = True
                 
@@ -230,33 +348,33 @@ def cambiar_modo():
     Endpoint para cambiar el modo de operación del sistema.
     Implementa validación completa, manejo de errores y auditoría.
     """
-    inicio = datetime.now()
+    inicio_ns = time.monotonic_ns()
     
     try:
-        # 1. Validación de entrada
-        data = request.get_json()
-        if not data or 'modo' not in data:
+        # 1. Validación de entrada (cuerpo ya parseado por requiere_confirmacion)
+        data = g.datos
+        if 'modo' not in data:
             return jsonify({
                 "status": "error",
                 "msg": "Falta el parámetro 'modo' en la solicitud"
             }), 400
         
-        nuevo_modo = data['modo'].upper()
-        
-        # 2. Validar modo
+        # 2. Validar modo antes de cualquier acceso a la BD
+        nuevo_modo = data['modo']
         if not validar_modo(nuevo_modo):
-            modos_validos = ', '.join(app.config['MODOS_VALIDOS'])
             return jsonify({
                 "status": "error",
-                "msg": f"Modo inválido. Modos válidos: {modos_validos}"
+                "msg": f"Modo inválido. Modos válidos: {MODOS_VALIDOS_STR}"
             }), 400
+        nuevo_modo = nuevo_modo.upper()
         
-        # 3. Obtener estado actual
-        estado_actual = db.obtener_estado()
+        # 3. Obtener estado actual (sin caché: otro worker pudo cambiarlo)
+        estado_actual = db.obtener_estado(use_cache=False)
         modo_previo = estado_actual.get('modo_actual', 'UNKNOWN')
         
         # 4. Verificar si ya está en ese modo
-        if modo_previo == app.config['CONFIGURACIONES_MODOS'][nuevo_modo]['modo_actual']:
+        modo_actual, carga_cpu, latencia, detalles = CONFIG_FROZEN[nuevo_modo]
+        if modo_previo == modo_actual:
             return jsonify({
                 "status": "info",
                 "msg": f"El sistema ya está en modo {nuevo_modo}",
@@ -264,32 +382,33 @@ def cambiar_modo():
             })
         
         # 5. Aplicar nueva configuración
-        nueva_config = app.config['CONFIGURACIONES_MODOS'][nuevo_modo].copy()
-        detalles = nueva_config.pop('detalles')
+        nueva_config = {
+            "modo_actual": modo_actual,
+            "carga_cpu": carga_cpu,
+            "latencia": latencia
+        }
         
-        # 6. Actualizar estado en BD (thread-safe)
-
         # 6. Actualizar estado en BD (thread-safe)
         if not db.actualizar_estado(nueva_config):
             raise Exception("Error al actualizar estado en base de datos")
         
         # 7. Registrar en auditoría
-        duracion = (datetime.now() - inicio).total_seconds() * 1000
+        duracion = (time.monotonic_ns() - inicio_ns) / 1e6
         registrar_accion(
             evento="CAMBIO_MODO",
             detalles=f"{detalles} (Procesado en {duracion:.2f}ms)",
             estado_previo=modo_previo,
-            estado_nuevo=nueva_config['modo_actual']
+            estado_nuevo=modo_actual
         )
         
-        logger.info(f"Modo cambiado: {modo_previo} → {nueva_config['modo_actual']} por {current_user.username}")
+        logger.info(f"Modo cambiado: {modo_previo} → {modo_actual} por {current_user.username}")
         
         # 8. Respuesta exitosa
         return jsonify({
             "status": "success",
             "estado": nueva_config,
             "msg": detalles,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()  # orjson lo serializa en ISO 8601
         })
         
     except ValueError as e:
@@ -310,50 +429,90 @@ def obtener_estado_actual():
     """Obtiene el estado actual del sistema desde la BD"""
     try:
         estado = db.obtener_estado()
-        return jsonify({
+        
+        # Validador derivado del contenido: idéntico en todos los workers
+        etag = f"e{zlib.crc32(repr(sorted(estado.items())).encode()):08x}"
+        if etag_vigente(etag):
+            return no_modificado(etag)
+        
+        return con_etag(jsonify({
             "status": "success",
             "estado": estado,
-            "timestamp": datetime.now().isoformat()
-        })
+            "timestamp": datetime.now()
+        }), etag)
     except Exception as e:
         logger.error(f"Error al obtener estado: {str(e)}")
         return jsonify({"status": "error", "msg": "Error al obtener estado"}), 500
 
+# Cuerpos JSON del historial ya serializados, por ETag (versión de los logs + página).
+# Se descartan en bloque al cambiar la versión: el polling repetido no vuelve a
+# consultar ni a serializar mientras no se registren eventos nuevos. Dentro de una
+# versión se conservan las CACHE_HISTORIAL_MAX páginas usadas más recientemente.
+# Los hilos del worker (gthread) la comparten: versión y cuerpos sólo se leen y
+# modifican con _historial_lock; la serialización ocurre fuera del lock
+_historial_version: Optional[tuple] = None
+_historial_cuerpos: "OrderedDict[str, bytes]" = OrderedDict()
+_historial_lock = threading.Lock()
+HISTORIAL_CACHE_MAX = app.config['CACHE_HISTORIAL_MAX']
+
 @app.route('/api/historial', methods=['GET'])
 @login_required
 def obtener_historial():
     """
-    Recupera el historial de eventos con paginación opcional.
+    Recupera el historial de eventos con paginación por keyset.
+    `after_id` recibe el `next_cursor` de la página anterior.
     Serealiza los datos para evitar problemas de encoding.
     """
+    global _historial_version
     try:
-        limite = request.args.get('limite', default=20, type=int)
-        
-        # Limitar el máximo de registros por seguridad
-        if limite > 100:
-            limite = 100
-        
-        logs = db.obtener_ultimos_logs(limite)
-        
-        # Serialización robusta
-        datos_limpios = [
-            {
-                "id": row[0],
-                "fecha": row[1],
-                "nivel": row[2],
-                "usuario": row[3] or "Sistema",
-                "evento": row[4],
-                "detalle": row[5] or "",
-                "ip": row[6]
-            }
-            for row in logs
-        ]
+        limite = acotar_limite(request.args.get('limite', default=20, type=int))
+        after_id = request.args.get('after_id', type=int)
+        
+        # Versión del historial (id máximo + total): evita la consulta si el cliente está al día
+        version = db.version_logs()
+        if version is not None:
+            ultimo_id, total_registros = version
+            etag = f"h{ultimo_id}-{total_registros}-{limite}-{after_id or 0}"
+            if etag_vigente(etag):
+                return no_modificado(etag)
+            
+            with _historial_lock:
+                if _historial_version != version:
+                    _historial_cuerpos.clear()
+                    _historial_version = version
+                cuerpo = _historial_cuerpos.get(etag)
+                if cuerpo is not None:
+                    _historial_cuerpos.move_to_end(etag)  # Orden LRU: la más reciente al final
+            if cuerpo is not None:
+                return con_etag(app.response_class(cuerpo, mimetype=app.json.mimetype), etag)
+        else:
+            etag, total_registros = None, db.contar_logs()
         
-        return jsonify({
+        # Filas sqlite3.Row con los nombres de campo de la API (alias en SQL);
+        # los valores por defecto ya vienen resueltos y el proveedor JSON las serializa
+        logs = db.obtener_ultimos_logs(limite, after_id=after_id)
+        
+        # Cursor para la siguiente página (None si no hay más registros)
+        next_cursor = logs[-1]["id"] if logs and len(logs) == limite else None
+        
+        respuesta = jsonify({
             "status": "success",
-            "logs": datos_limpios,
-            "total": len(datos_limpios)
+            "logs": logs,
+            "total": len(logs),
+            "total_registros": total_registros,
+            "next_cursor": next_cursor
         })
+        if not etag:
+            return respuesta
+        cuerpo = respuesta.get_data()
+        with _historial_lock:
+            # Otro hilo pudo ver ya una versión más nueva: esta página quedaría obsoleta
+            if _historial_version == version:
+                _historial_cuerpos[etag] = cuerpo
+                _historial_cuerpos.move_to_end(etag)
+                if len(_historial_cuerpos) > HISTORIAL_CACHE_MAX:
+                    _historial_cuerpos.popitem(last=False)
+        return con_etag(respuesta, etag)
         
     except Exception as e:
         logger.error(f"Error al obtener historial: {str(e)}")
@@ -379,10 +538,18 @@ def no_autorizado(e):
 @app.errorhandler(429)
 def limite_excedido(e):
     """Maneja rate limiting"""
-    return jsonify({
+    limite_actual = limiter.current_limit
+    if limite_actual:
+        retry_after = max(int(limite_actual.reset_at - time.time()), 1)
+    else:
+        retry_after = e.limit.limit.get_expiry()
+    
+    respuesta = jsonify({
         "error": "Demasiadas solicitudes. Intente nuevamente más tarde.",
-        "retry_after": e.description
-    }), 429
+        "retry_after": retry_after
+    })
+    respuesta.headers['Retry-After'] = str(retry_after)
+    return respuesta, 429
 
 @app.errorhandler(500)
 def error_interno(e):
@@ -398,7 +565,7 @@ def error_interno(e):
 @login_required
 def admin_panel():
     """Panel de administración (solo para admin)"""
-    if current_user.username != 'admin':
+    if current_user.rol != ROL_ADMIN:
         return redirect(url_for('index'))
     return render_template('admin.html', usuario=current_user.username)
 
@@ -406,11 +573,9 @@ def admin_panel():
 
 @app.route('/api/admin/usuarios', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def obtener_usuarios():
     """Obtiene lista de todos los usuarios"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         usuarios = db.obtener_todos_usuarios()
         return jsonify({"status": "success", "usuarios": usuarios})
@@ -420,11 +585,9 @@ def obtener_usuarios():
 
 @app.route('/api/admin/usuarios', methods=['POST'])
 @login_required
+@role_required(ROL_ADMIN)
 def crear_usuario():
     """Crea un nuevo usuario"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         datos = request.get_json()
         username = datos.get('username')
@@ -436,7 +599,7 @@ def crear_usuario():
         if not username or not password:
             return jsonify({"error": "Username y password requeridos"}), 400
         
-        password_hash = generate_password_hash(password)
+        password_hash = generar_hash(password, app.config['BCRYPT_ROUNDS'])
         
         if db.crear_usuario(username, password_hash, rol, nombre_completo, email):
             registrar_accion(
@@ -454,11 +617,9 @@ def crear_usuario():
 
 @app.route('/api/admin/usuarios/<int:user_id>', methods=['PUT'])
 @login_required
+@role_required(ROL_ADMIN)
 def actualizar_usuario(user_id):
     """Actualiza datos de un usuario"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         datos = request.get_json()
         
@@ -482,11 +643,9 @@ def actualizar_usuario(user_id):
 
 @app.route('/api/admin/usuarios/<int:user_id>', methods=['DELETE'])
 @login_required
+@role_required(ROL_ADMIN)
 def eliminar_usuario(user_id):
     """Elimina (desactiva) un usuario"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         if db.eliminar_usuario(user_id):
             registrar_accion(
@@ -506,31 +665,63 @@ def eliminar_usuario(user_id):
 
 @app.route('/api/admin/logs/buscar', methods=['POST'])
 @login_required
+@role_required(ROL_ADMIN)
 def buscar_logs():
-    """Busca logs con filtros avanzados"""
+    """
+    Busca logs con filtros avanzados.
+    La respuesta JSON se emite en streaming a medida que se leen las filas;
+    `total` y `next_cursor` cierran el objeto al final.
+    """
     try:
-        filtros = request.get_json()
-        limite = filtros.pop('limite', 50)
+        filtros = request.get_json(silent=True)
+        if not isinstance(filtros, dict):
+            return jsonify({"error": "Se esperaba un objeto JSON con los filtros"}), 400
+        
+        # Validación completa antes de emitir la cabecera 200: después ya no hay vuelta atrás
+        try:
+            limite = acotar_limite(int(filtros.pop('limite', 50)))
+            if filtros.get('after_id') is not None:
+                filtros['after_id'] = int(filtros['after_id'])
+        except (TypeError, ValueError):
+            return jsonify({"error": "limite y after_id deben ser números enteros"}), 400
+        # Los filtros se enlazan tal cual en la consulta: sólo texto, enteros (y bool) o null
+        if not all(valor is None or isinstance(valor, (str, int)) for valor in filtros.values()):
+            return jsonify({"error": "Los filtros deben ser texto, números enteros o null"}), 400
+        
+        # La consulta se ejecuta al pedir la primera fila: un error de BD aún se responde con 500
+        filas = db.iter_buscar_logs(filtros, limite)
+        primera = next(filas, None)
+        
+        def generar():
+            yield '{"status":"success","logs":['
+            total = 0
+            ultimo_id = None
+            for log in chain(() if primera is None else (primera,), filas):
+                yield (',' if total else '') + app.json.dumps(log)
+                total += 1
+                ultimo_id = log["id"]
+            
+            # Cursor para la siguiente página: se envía como `after_id`
+            next_cursor = ultimo_id if total == limite else None
+            yield f'],"total":{total},"next_cursor":{app.json.dumps(next_cursor)}}}'
         
-        logs = db.buscar_logs(filtros, limite)
-        return jsonify({"status": "success", "logs": logs, "total": len(logs)})
+        return Response(stream_with_context(generar()), mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error al buscar logs: {e}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": "Error al buscar logs"}), 500
 
 @app.route('/api/admin/logs/limpiar', methods=['POST'])
 @login_required
+@role_required(ROL_ADMIN)
 def limpiar_logs():
     """Elimina logs antiguos"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         datos = request.get_json()
         dias = datos.get('dias', 30)
         
         eliminados = db.eliminar_logs_antiguos(dias)
+        cache.invalidar('estadisticas')
         
         registrar_accion(
             evento="Limpieza de logs",
@@ -552,10 +743,15 @@ def limpiar_logs():
 
 @app.route('/api/admin/estadisticas', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def obtener_estadisticas():
     """Obtiene estadísticas generales del sistema"""
     try:
-        stats = db.obtener_estadisticas_generales()
+        stats = cache.obtener(
+            'estadisticas',
+            app.config['CACHE_TTL_ESTADISTICAS'],
+            db.obtener_estadisticas_generales
+        )
         return jsonify({"status": "success", "estadisticas": stats})
         
     except Exception as e:
@@ -564,6 +760,7 @@ def obtener_estadisticas():
 
 @app.route('/api/admin/analiticas/usuarios', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def analitica_usuarios():
     """Obtiene actividad por usuario"""
     try:
@@ -577,6 +774,7 @@ def analitica_usuarios():
 
 @app.route('/api/admin/analiticas/eventos-diarios', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def eventos_diarios():
     """Obtiene eventos agrupados por día"""
     try:
@@ -590,11 +788,17 @@ def eventos_diarios():
 
 @app.route('/api/admin/analiticas/timeline-modos', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def timeline_modos():
     """Obtiene timeline de cambios de modo"""
     try:
-        limite = request.args.get('limite', default=20, type=int)
-        timeline = db.obtener_cambios_modo_timeline(limite)
+        # Acotado antes de armar la clave: cada valor distinto sería una entrada de caché
+        limite = acotar_limite(request.args.get('limite', default=20, type=int))
+        timeline = cache.obtener(
+            ('timeline', limite),
+            app.config['CACHE_TTL_TIMELINE'],
+            lambda: db.obtener_cambios_modo_timeline(limite)
+        )
         return jsonify({"status": "success", "timeline": timeline})
         
     except Exception as e:
@@ -605,6 +809,7 @@ def timeline_modos():
 
 @app.route('/api/admin/configuraciones', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def obtener_configuraciones():
     """Obtiene configuraciones del sistema"""
     try:
@@ -618,11 +823,9 @@ def obtener_configuraciones():
 
 @app.route('/api/admin/configuraciones/<clave>', methods=['PUT'])
 @login_required
+@role_required(ROL_ADMIN)
 def actualizar_configuracion(clave):
     """Actualiza una configuración"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         datos = request.get_json()
         valor = datos.get('valor')
@@ -645,44 +848,44 @@ def actualizar_configuracion(clave):
 
 @app.route('/api/admin/exportar/logs', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def exportar_logs():
-    """Exporta logs a CSV"""
+    """Exporta logs a CSV en streaming, fila por fila"""
     try:
-        import csv
-        from io import StringIO
-        
         limite = request.args.get('limite', default=1000, type=int)
-        logs = db.obtener_ultimos_logs(limite)
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Fecha', 'Nivel', 'Usuario', 'Evento', 'Detalles', 'IP'])
+        writer = csv.writer(_EchoBuffer())
         
-        for log in logs:
-            writer.writerow(log)
+        def generar():
+            yield writer.writerow(['ID', 'Fecha', 'Nivel', 'Usuario', 'Evento', 'Detalles', 'IP'])
+            
+            total = 0
+            for log in db.iter_ultimos_logs(limite):
+                total += 1
+                yield writer.writerow(log)
+            
+            registrar_accion(
+                evento="Exportación de datos",
+                detalles=f"Exportados {total} registros a CSV",
+                nivel="INFO"
+            )
         
-        registrar_accion(
-            evento="Exportación de datos",
-            detalles=f"Exportados {len(logs)} registros a CSV",
-            nivel="INFO"
+        return Response(
+            stream_with_context(generar()),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition': f'attachment; filename=logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+            }
         )
         
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/csv',
-            'Content-Disposition': f'attachment; filename=logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        }
-        
     except Exception as e:
         logger.error(f"Error al exportar logs: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/admin/analiticas/uso-por-modo', methods=['GET'])
 @login_required
+@role_required(ROL_ADMIN)
 def obtener_uso_por_modo():
     """Obtiene estadísticas de uso por modo del auditorio"""
-    if current_user.username != 'admin':
-        return jsonify({"error": "Acceso denegado"}), 403
-    
     try:
         datos = db.obtener_uso_por_modo()
         return jsonify({
@@ -698,6 +901,13 @@ def obtener_uso_por_modo():
 # ============================================================================
 
 if __name__ == '__main__':
+    # El servidor de Werkzeug sólo para desarrollo; en producción usar gunicorn
+    if not (app.config['DEBUG'] or os.environ.get('USE_DEV_SERVER')):
+        print("Servidor de desarrollo deshabilitado en este entorno.")
+        print("Ejecutar con: gunicorn -c gunicorn.conf.py wsgi:app")
+        print("(o definir USE_DEV_SERVER=1 para forzar el servidor de desarrollo)")
+        raise SystemExit(1)
+    
     print("\n" + "="*70)
     print("🎯 SISTEMA DE AUDIO DISTRIBUIDO - VERSIÓN PROFESIONAL 2.0")
     print("="*70)
@@ -706,9 +916,11 @@ if __name__ == '__main__':
     print(f"🛡️  Rate Limiting: {'ACTIVADO' if app.config['RATELIMIT_ENABLED'] else 'DESACTIVADO'}")
     print(f"📊 Base de Datos: {app.config['DATABASE_PATH']}")
     print(f"📝 Logs: logs/sistema.log")
+    print(f"🎚️  Modos: {MODOS_VALIDOS_STR}")
     print("="*70)
     print(f"🌐 Servidor iniciando en http://localhost:5000")
-    print(f"👤 Usuarios disponibles: {', '.join(app.config['USUARIOS_VALIDOS'].keys())}")
+    usuarios_activos = [u['username'] for u in db.obtener_todos_usuarios() if u['activo']]
+    print(f"👤 Usuarios disponibles: {', '.join(usuarios_activos)}")
     print("="*70 + "\n")
     
     # Registrar inicio del sistema
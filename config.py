@@ -13,27 +13,49 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
+    SESSION_TYPE = None  # None: cookie firmada de Flask; 'redis': sesión en servidor
+    SESSION_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
+    SESSION_USE_SIGNER = True
     
     # Base de datos
-    DATABASE_PATH = "database/auditorio.db"
+    # Ruta o URI de SQLite (`file:...`), p. ej. una BD en memoria compartida en pruebas
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', 'database/auditorio.db')
     
     # Rate Limiting
     RATELIMIT_ENABLED = True
-    RATELIMIT_STORAGE_URL = "memory://"
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMIT_STRATEGY = 'moving-window'
+    RATELIMIT_HEADERS_ENABLED = True  # Emite X-RateLimit-* y Retry-After
     RATELIMIT_DEFAULT = "200 per day;50 per hour"
     
+    # Compresión de respuestas (flask-compress)
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_LEVEL = 4       # Nivel gzip
+    COMPRESS_BR_LEVEL = 4    # Calidad Brotli (0-11): buen ratio con poco costo de CPU
+    COMPRESS_MIN_SIZE = 512  # Bytes; respuestas menores no compensan la compresión
+    
     # Logging
     LOG_LEVEL = "INFO"
     LOG_FILE = "logs/sistema.log"
+
+    # Auditoría (escritura por lotes en segundo plano)
+    AUDITORIA_BATCH_SIZE = 100
+    AUDITORIA_BATCH_MS = 500
     
-    # Credenciales de ejemplo
-    USUARIOS_VALIDOS = {
-        "admin": "admin123",  
-        "operador": "oper456"
-    }
+    # Caché de lecturas frecuentes (segundos)
+    CACHE_TTL_ESTADO = 1
+    CACHE_TTL_TIMELINE = 10
+    CACHE_TTL_ESTADISTICAS = 30
+    CACHE_HISTORIAL_MAX = 32  # Páginas del historial serializadas que se conservan (LRU)
     
-    # Modos válidos del sistema
-    MODOS_VALIDOS = ["CONFERENCIA", "CINE", "OFF", "STANDBY"]
+    # Verificación de contraseñas (las credenciales viven hasheadas en la tabla usuarios)
+    PASSWORD_CACHE_SIZE = 1024
+    PASSWORD_CACHE_TTL = 60  # segundos
+    BCRYPT_ROUNDS = 12  # Factor de costo de los hashes nuevos (cada +1 duplica el tiempo)
+    
+    # Modos válidos del sistema (frozenset: pertenencia O(1); el texto se usa en mensajes)
+    MODOS_VALIDOS = frozenset({"CONFERENCIA", "CINE", "OFF", "STANDBY"})
+    MODOS_VALIDOS_STR = "CONFERENCIA, CINE, OFF, STANDBY"
     
     # Configuraciones de hardware simulado
     CONFIGURACIONES_MODOS = {
@@ -73,10 +95,24 @@ class ProductionConfig(Config):
     DEBUG = False
     SESSION_COOKIE_SECURE = True  # Requiere HTTPS
     RATELIMIT_ENABLED = True
+    # Contadores compartidos entre workers (memory:// multiplica el límite por proceso)
+    RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
+    # Sesiones en Redis: la cookie sólo transporta el ID y la sesión es común a todos los workers
+    SESSION_TYPE = 'redis'
+
+class TestingConfig(Config):
+    """Configuración para Pruebas"""
+    TESTING = True
+    # BD en memoria con nombre y caché compartida: todas las conexiones del proceso
+    # ven el mismo esquema, que se crea una sola vez y no toca el disco
+    DATABASE_PATH = 'file:testdb?mode=memory&cache=shared'
+    RATELIMIT_ENABLED = False
+    BCRYPT_ROUNDS = 4  # Hashes baratos en las pruebas
 
 # Selección automática de configuración
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,34 @@
+"""
+Configuración de Gunicorn - Servidor WSGI de Producción
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+# Red
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+
+# Workers: procesos para repartir el hashing de contraseñas entre núcleos,
+# hilos por worker para solapar la E/S de SQLite
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = 1000  # Sólo aplica a workers asíncronos (gevent/eventlet)
+timeout = 30
+
+# Cargar la aplicación una vez en el master y compartirla por copy-on-write
+preload_app = True
+
+# Logging
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """
+    Las conexiones SQLite abiertas en el master no deben usarse tras el fork,
+    y el hilo que escribe los logs no sobrevive al fork: se relanza en el worker.
+    """
+    from app import db, log_listener
+    db.reiniciar_conexiones()
+    log_listener.start()
@@ -5,27 +5,47 @@ Permite crear, verificar y resetear la base de datos del sistema
 import sys
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Optional
 
 # Agregar el directorio actual al path
 sys.path.insert(0, os.path.dirname(__file__))
 
 from modulos.gestor_datos import DatabaseManager
-from werkzeug.security import generate_password_hash
 
-def crear_base_datos(db_path: str = "database/auditorio.db"):
+# Tamaño de la cabecera de un archivo SQLite: por debajo no hay base de datos
+TAMANO_CABECERA_SQLITE = 100
+
+# Plantilla del reporte de estadísticas, construida una sola vez
+SEPARADOR = "=" * 70
+PLANTILLA_ESTADISTICAS = (
+    f"{SEPARADOR}\n"
+    "ESTADÍSTICAS DEL SISTEMA DE CONTROL DE AUDITORIO\n"
+    "Generado: {generado}\n"
+    f"{SEPARADOR}\n\n"
+    "Total de eventos registrados: {total_logs}\n"
+    "Usuarios activos: {usuarios_activos}\n"
+    "Cambios de modo hoy: {cambios_hoy}\n\n"
+    "Eventos por nivel:\n"
+    "{eventos_nivel}"
+    f"\n{SEPARADOR}\n"
+)
+
+def crear_base_datos(db: DatabaseManager, force_check: bool = False):
     """Crea la base de datos con la estructura completa"""
-    print(f"📦 Creando base de datos en: {db_path}")
+    print(f"📦 Creando base de datos en: {db.db_path}")
     
     try:
-        db = DatabaseManager(db_path)
+        # La estructura se crea al instanciar DatabaseManager
         print("✅ Base de datos creada exitosamente")
         
         # Mostrar información
-        health = db.health_check()
+        health = db.health_check(use_cache=not force_check)
         print(f"\n📊 Información de la base de datos:")
         print(f"   - Estado: {health['status']}")
         print(f"   - Integridad: {health['integrity']}")
+        print(f"   - Modo de diario: {health['journal_mode']}")
         print(f"   - Tamaño: {health['db_size_mb']} MB")
         print(f"   - Tablas: {health['num_tables']}")
         print(f"   - Logs registrados: {health['total_logs']}")
@@ -35,78 +55,98 @@ def crear_base_datos(db_path: str = "database/auditorio.db"):
         print(f"❌ Error al crear base de datos: {e}")
         return False
 
-def verificar_base_datos(db_path: str = "database/auditorio.db"):
-    """Verifica el estado de la base de datos"""
-    print(f"🔍 Verificando base de datos: {db_path}")
-    
-    if not os.path.exists(db_path):
-        print("❌ La base de datos no existe")
-        return False
+def verificar_base_datos(db: DatabaseManager, force_check: bool = False, quick: bool = False):
+    """Verifica el estado de la base de datos (quick: PRAGMA quick_check)"""
+    print(f"🔍 Verificando base de datos: {db.db_path}")
     
     try:
-        db = DatabaseManager(db_path)
-        health = db.health_check()
+        # Consultas independientes en paralelo: en WAL los lectores no se bloquean
+        # y cada hilo usa su propia conexión del DatabaseManager
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            f_health = pool.submit(db.health_check, not force_check, 'quick' if quick else 'full')
+            f_usuarios = pool.submit(db.listar_usuarios_resumen)
+            f_estado = pool.submit(db.obtener_estado)
+            f_logs = pool.submit(db.obtener_ultimos_logs, 5)
+        health = f_health.result()
+        usuarios = f_usuarios.result()
+        estado_sistema = f_estado.result()
+        logs = f_logs.result()
         
-        print(f"\n📊 Estado de la Base de Datos:")
-        print(f"   ✅ Estado: {health['status']}")
-        print(f"   ✅ Integridad: {health['integrity']}")
-        print(f"   📁 Tamaño: {health['db_size_mb']} MB ({health['db_size_bytes']} bytes)")
-        print(f"   📋 Tablas: {health['num_tables']}")
-        print(f"   📝 Total de logs: {health['total_logs']}")
+        # El reporte completo se arma en memoria y se emite con una sola escritura
+        salida = [
+            "\n📊 Estado de la Base de Datos:",
+            f"   ✅ Estado: {health['status']}",
+            f"   ✅ Integridad: {health['integrity']}",
+            f"   📁 Tamaño: {health['db_size_mb']} MB ({health['db_size_bytes']} bytes)",
+            f"   📋 Tablas: {health['num_tables']}",
+            f"   📝 Total de logs: {health['total_logs']}",
+        ]
         
         # Verificar usuarios
-        usuarios = db.obtener_todos_usuarios()
-        print(f"\n👥 Usuarios registrados: {len(usuarios)}")
-        for usuario in usuarios:
-            estado = "🟢 Activo" if usuario['activo'] else "🔴 Inactivo"
-            print(f"   {estado} - {usuario['username']} ({usuario['rol']})")
+        salida.append(f"\n👥 Usuarios registrados: {len(usuarios)}")
+        salida.extend(
+            f"   {'🟢 Activo' if usuario['activo'] else '🔴 Inactivo'} - {usuario['username']} ({usuario['rol']})"
+            for usuario in usuarios
+        )
         
         # Verificar estado del sistema
-        estado_sistema = db.obtener_estado()
-        print(f"\n⚙️  Estado del sistema:")
-        for clave, valor in estado_sistema.items():
-            print(f"   - {clave}: {valor}")
+        salida.append("\n⚙️  Estado del sistema:")
+        salida.extend(f"   - {clave}: {valor}" for clave, valor in estado_sistema.items())
         
         # Últimos logs
-        logs = db.obtener_ultimos_logs(limite=5)
-        print(f"\n📜 Últimos 5 eventos:")
-        for log in logs:
-            print(f"   - [{log[2]}] {log[1]} - {log[4]} por {log[3] or 'sistema'}")
+        salida.append("\n📜 Últimos 5 eventos:")
+        salida.extend(
+            f"   - [{log['nivel']}] {log['fecha']} - {log['evento']} por {log['usuario']}"
+            for log in logs
+        )
+        
+        sys.stdout.write('\n'.join(salida) + '\n')
+        sys.stdout.flush()
         
         return True
     except Exception as e:
         print(f"❌ Error al verificar base de datos: {e}")
         return False
 
-def resetear_base_datos(db_path: str = "database/auditorio.db"):
-    """Elimina y recrea la base de datos"""
+def resetear_base_datos(db: DatabaseManager, confirmado: bool = False):
+    """
+    Elimina todas las tablas y recrea la estructura de la base de datos.
+    Con `confirmado` (--yes) se omite la confirmación interactiva.
+    """
     print(f"⚠️  ADVERTENCIA: Esto eliminará todos los datos existentes")
     
-    respuesta = input("¿Está seguro de continuar? (escriba 'SI' para confirmar): ")
-    if respuesta != 'SI':
-        print("❌ Operación cancelada")
-        return False
+    if not confirmado:
+        respuesta = input("¿Está seguro de continuar? (escriba 'SI' para confirmar): ")
+        if respuesta != 'SI':
+            print("❌ Operación cancelada")
+            return False
     
     try:
-        # Eliminar archivo si existe
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            print(f"🗑️  Base de datos anterior eliminada")
+        if not db.resetear():
+            print("❌ No se pudo resetear la base de datos")
+            return False
+        print(f"🗑️  Datos anteriores eliminados")
         
-        # Crear nueva
-        return crear_base_datos(db_path)
+        # Mostrar la estructura recreada
+        return crear_base_datos(db, force_check=True)
     except Exception as e:
         print(f"❌ Error al resetear base de datos: {e}")
         return False
 
-def agregar_usuario(db_path: str, username: str, password: str, rol: str, 
-                   nombre: str = None, email: str = None):
-    """Agrega un nuevo usuario a la base de datos"""
+def agregar_usuario(db: DatabaseManager, username: str, password: str, rol: str, 
+                   nombre: str = None, email: str = None, rounds: Optional[int] = None):
+    """
+    Agrega un nuevo usuario a la base de datos.
+    `rounds` permite abaratar el hash en semillas de desarrollo; en producción
+    debe mantenerse el costo por defecto (BCRYPT_ROUNDS).
+    """
+    # Import diferido: sólo este comando necesita bcrypt/werkzeug
+    from modulos.seguridad import generar_hash, BCRYPT_ROUNDS
+    
     print(f"👤 Agregando usuario: {username}")
     
     try:
-        db = DatabaseManager(db_path)
-        password_hash = generate_password_hash(password)
+        password_hash = generar_hash(password, rounds or BCRYPT_ROUNDS)
         
         result = db.crear_usuario(
             username=username,
@@ -126,13 +166,11 @@ def agregar_usuario(db_path: str, username: str, password: str, rol: str,
         print(f"❌ Error al agregar usuario: {e}")
         return False
 
-def generar_datos_prueba(db_path: str = "database/auditorio.db"):
+def generar_datos_prueba(db: DatabaseManager):
     """Genera datos de prueba para desarrollo"""
     print("🧪 Generando datos de prueba...")
     
     try:
-        db = DatabaseManager(db_path)
-        
         # Registrar eventos de prueba
         eventos = [
             ('LOGIN', 'Login exitoso', 'INFO', 'admin'),
@@ -142,15 +180,14 @@ def generar_datos_prueba(db_path: str = "database/auditorio.db"):
             ('LOGOUT', 'Logout exitoso', 'INFO', 'admin'),
         ]
         
-        for evento, detalle, nivel, usuario in eventos:
-            db.registrar_evento(
-                evento=evento,
-                detalles=detalle,
-                ip='127.0.0.1',
-                nivel=nivel,
-                usuario=usuario,
-                user_agent='Script de prueba'
-            )
+        # Un solo INSERT preparado y una sola transacción para todo el lote
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        filas = (
+            (fecha, nivel, usuario, evento, None, None, detalle, '127.0.0.1', 'Script de prueba')
+            for evento, detalle, nivel, usuario in eventos
+        )
+        if not db.registrar_eventos(filas):
+            raise RuntimeError("No se pudieron registrar los eventos de prueba")
         
         print(f"✅ {len(eventos)} eventos de prueba registrados")
         
@@ -168,31 +205,31 @@ def generar_datos_prueba(db_path: str = "database/auditorio.db"):
         print(f"❌ Error al generar datos de prueba: {e}")
         return False
 
-def exportar_estadisticas(db_path: str = "database/auditorio.db"):
+def exportar_estadisticas(db: DatabaseManager):
     """Exporta estadísticas del sistema a un archivo"""
     print("📊 Exportando estadísticas...")
     
     try:
-        db = DatabaseManager(db_path)
         stats = db.obtener_estadisticas_generales()
         
         filename = f"estadisticas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("=" * 70 + "\n")
-            f.write("ESTADÍSTICAS DEL SISTEMA DE CONTROL DE AUDITORIO\n")
-            f.write(f"Generado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 70 + "\n\n")
-            
-            f.write(f"Total de eventos registrados: {stats.get('total_eventos', 0)}\n")
-            f.write(f"Usuarios activos: {stats.get('usuarios_activos', 0)}\n")
-            f.write(f"Cambios de modo hoy: {stats.get('cambios_hoy', 0)}\n\n")
-            
-            f.write("Eventos por nivel:\n")
-            for nivel, cantidad in stats.get('eventos_nivel', {}).items():
-                f.write(f"  - {nivel}: {cantidad}\n")
-            
-            f.write("\n" + "=" * 70 + "\n")
+        # El reporte se arma en memoria y se escribe con una sola llamada
+        reporte = PLANTILLA_ESTADISTICAS.format(
+            generado=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            total_logs=stats.get('total_logs', 0),
+            usuarios_activos=stats.get('usuarios_activos', 0),
+            cambios_hoy=stats.get('cambios_hoy', 0),
+            eventos_nivel=''.join(
+                f"  - {nivel}: {cantidad}\n"
+                for nivel, cantidad in stats.get('eventos_nivel', {}).items()
+            )
+        )
+        
+        with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(reporte)
+            f.flush()
+            os.fsync(f.fileno())
         
         print(f"✅ Estadísticas exportadas a: {filename}")
         return True
@@ -200,6 +237,26 @@ def exportar_estadisticas(db_path: str = "database/auditorio.db"):
         print(f"❌ Error al exportar estadísticas: {e}")
         return False
 
+def mantenimiento_base_datos(db: DatabaseManager):
+    """Actualiza las estadísticas del planificador y compacta la base de datos"""
+    print(f"🧹 Mantenimiento de: {db.db_path}")
+    
+    try:
+        tamano_previo = os.stat(db.db_path).st_size
+        print(f"   Páginas libres: {db.fragmentacion():.1%}")
+        
+        db.optimize()
+        if not db.vacuum():
+            print("❌ No se pudo compactar la base de datos")
+            return False
+        
+        tamano = os.stat(db.db_path).st_size
+        print(f"✅ Tamaño: {tamano_previo} → {tamano} bytes")
+        return True
+    except Exception as e:
+        print(f"❌ Error en el mantenimiento: {e}")
+        return False
+
 def main():
     """Función principal con interfaz CLI"""
     parser = argparse.ArgumentParser(
@@ -207,11 +264,17 @@ def main():
     )
     
     parser.add_argument('comando', 
-                       choices=['crear', 'verificar', 'resetear', 'usuario', 'prueba', 'stats'],
+                       choices=['crear', 'verificar', 'resetear', 'usuario', 'prueba', 'stats', 'mantenimiento'],
                        help='Comando a ejecutar')
     
     parser.add_argument('--db', default='database/auditorio.db',
                        help='Ruta a la base de datos (default: database/auditorio.db)')
+    parser.add_argument('--force-check', action='store_true',
+                       help='Repetir el chequeo de integridad aunque haya uno reciente')
+    parser.add_argument('--quick', action='store_true',
+                       help='verificar: usar PRAGMA quick_check en lugar de integrity_check')
+    parser.add_argument('--yes', '-y', action='store_true',
+                       help='resetear: no pedir confirmación (uso en scripts)')
     
     # Argumentos para crear usuario
     parser.add_argument('--username', help='Nombre de usuario')
@@ -219,6 +282,8 @@ def main():
     parser.add_argument('--rol', choices=['admin', 'operador'], help='Rol del usuario')
     parser.add_argument('--nombre', help='Nombre completo del usuario')
     parser.add_argument('--email', help='Email del usuario')
+    parser.add_argument('--cost', type=int,
+                       help='Factor de costo bcrypt, 4-31 (default: el de producción; usar valores bajos sólo en desarrollo)')
     
     args = parser.parse_args()
     
@@ -226,27 +291,54 @@ def main():
     print("🗄️  GESTOR DE BASE DE DATOS - Sistema de Control de Auditorio")
     print("=" * 70 + "\n")
     
+    if args.comando == 'usuario' and not all([args.username, args.password, args.rol]):
+        print("❌ Error: Se requieren --username, --password y --rol")
+        return 1
+    
+    if args.cost is not None and not 4 <= args.cost <= 31:
+        print("❌ Error: --cost debe estar entre 4 y 31")
+        return 1
+    
+    if args.comando == 'verificar':
+        # Un solo stat: inexistente o sin cabecera SQLite (100 bytes) no se abre,
+        # así no se crean tablas ni archivos -wal/-shm sobre una BD vacía
+        try:
+            tamano = os.stat(args.db).st_size
+        except FileNotFoundError:
+            tamano = None
+        if tamano is None or tamano < TAMANO_CABECERA_SQLITE:
+            print(f"🔍 Verificando base de datos: {args.db}")
+            print("❌ La base de datos no existe" if tamano is None else "⚠️ DB vacía")
+            return 1
+    
+    # Una sola instancia (y conexión) para toda la invocación
+    try:
+        db = DatabaseManager(args.db)
+    except Exception as e:
+        print(f"❌ Error al abrir la base de datos: {e}")
+        return 1
+    
     if args.comando == 'crear':
-        crear_base_datos(args.db)
+        crear_base_datos(db, args.force_check)
     
     elif args.comando == 'verificar':
-        verificar_base_datos(args.db)
+        verificar_base_datos(db, args.force_check, args.quick)
     
     elif args.comando == 'resetear':
-        resetear_base_datos(args.db)
+        resetear_base_datos(db, args.yes)
     
     elif args.comando == 'usuario':
-        if not all([args.username, args.password, args.rol]):
-            print("❌ Error: Se requieren --username, --password y --rol")
-            return 1
-        agregar_usuario(args.db, args.username, args.password, args.rol, 
-                       args.nombre, args.email)
+        agregar_usuario(db, args.username, args.password, args.rol, 
+                       args.nombre, args.email, args.cost)
     
     elif args.comando == 'prueba':
-        generar_datos_prueba(args.db)
+        generar_datos_prueba(db)
     
     elif args.comando == 'stats':
-        exportar_estadisticas(args.db)
+        exportar_estadisticas(db)
+    
+    elif args.comando == 'mantenimiento':
+        mantenimiento_base_datos(db)
     
     print("\n" + "=" * 70 + "\n")
     return 0
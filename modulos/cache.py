@@ -0,0 +1,67 @@
+"""
+Caché en Memoria - Lecturas frecuentes con expiración corta
+Arquitectura: Cache-aside por proceso con invalidación explícita
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class CacheTTL:
+    """
+    Caché clave/valor con tiempo de vida por entrada.
+    Colapsa las lecturas repetidas de endpoints consultados por polling en una
+    sola consulta a la base de datos por intervalo. Cada worker mantiene su
+    propia copia; el TTL corto acota la desactualización entre procesos.
+    El total se limita a `max_entradas`: al superarlo se descartan las entradas
+    vencidas y, si no basta, las más antiguas (claves derivadas de la petición).
+    """
+
+    def __init__(self, max_entradas: int = 256):
+        self.max_entradas = max_entradas
+        self._datos: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()  # Compartida por los hilos del worker
+
+    def obtener(self, clave: Hashable, ttl: float, cargar: Callable[[], Any]) -> Any:
+        """
+        Devuelve el valor cacheado o lo carga si expiró.
+
+        Args:
+            clave: Identificador de la entrada
+            ttl: Segundos de validez del valor cargado
+            cargar: Función que obtiene el valor desde la fuente original
+
+        Returns:
+            El valor cacheado o recién cargado
+        """
+        ahora = time.monotonic()
+        entrada = self._datos.get(clave)
+        if entrada is not None and entrada[0] > ahora:
+            return entrada[1]
+
+        # La carga corre fuera del lock: una consulta lenta no bloquea al resto
+        valor = cargar()
+        # No cachear resultados vacíos (los métodos de BD devuelven {} o [] ante errores)
+        if valor:
+            with self._lock:
+                self._datos[clave] = (ahora + ttl, valor)
+                if len(self._datos) > self.max_entradas:
+                    self._purgar(ahora)
+        return valor
+
+    def _purgar(self, ahora: float) -> None:
+        """Descarta las entradas vencidas y, si aún sobran, las más antiguas (requiere el lock)"""
+        for clave in [c for c, (expira, _) in self._datos.items() if expira <= ahora]:
+            del self._datos[clave]
+        while len(self._datos) > self.max_entradas:
+            del self._datos[next(iter(self._datos))]
+
+    def invalidar(self, clave: Hashable) -> None:
+        """Descarta una entrada para forzar su recarga en la próxima lectura"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self) -> None:
+        """Descarta todas las entradas"""
+        with self._lock:
+            self._datos.clear()
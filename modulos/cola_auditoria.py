@@ -0,0 +1,136 @@
+"""
+Cola de Auditoría - Escritura diferida de eventos
+Arquitectura: Productor/Consumidor con hilo escritor dedicado y persistencia por lotes
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Marcador interno para detener el hilo escritor
+_FIN = object()
+
+
+class AuditLogQueue:
+    """
+    Desacopla el registro de auditoría del ciclo de la petición HTTP.
+    Los eventos se encolan en memoria y un hilo daemon los persiste en lotes
+    de hasta `batch_size` elementos o cada `batch_ms` milisegundos, lo que
+    ocurra primero. Una sola transacción por lote en lugar de una por evento.
+    """
+
+    BATCH_SIZE = 100
+    BATCH_MS = 500
+
+    def __init__(
+        self,
+        escritor: Callable[[List[Tuple]], bool],
+        batch_size: int = BATCH_SIZE,
+        batch_ms: int = BATCH_MS
+    ):
+        """
+        Args:
+            escritor: Función que persiste un lote completo (ej: DatabaseManager.registrar_eventos)
+            batch_size: Máximo de eventos por lote
+            batch_ms: Tiempo máximo de espera antes de persistir un lote incompleto
+        """
+        self._escritor = escritor
+        self.batch_size = batch_size
+        self.batch_ms = batch_ms
+        self._cola: queue.Queue = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # Drenar la cola al apagar el proceso para no perder eventos
+        atexit.register(self.drenar)
+
+    def encolar(self, evento: Tuple) -> None:
+        """Agrega un evento a la cola sin bloquear la petición"""
+        self._asegurar_hilo()
+        self._cola.put_nowait(evento)
+
+    def _asegurar_hilo(self) -> None:
+        """
+        Arranca el hilo escritor de forma perezosa.
+        Se verifica el PID porque los hilos no sobreviven a un fork
+        (ej: workers de gunicorn con preload).
+        """
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(
+                target=self._ejecutar,
+                name="auditoria-writer",
+                daemon=True
+            )
+            self._hilo.start()
+            logger.debug("Hilo escritor de auditoría iniciado")
+
+    def _ejecutar(self) -> None:
+        """Bucle del hilo escritor: agrupa eventos y los persiste por lotes"""
+        while True:
+            primero = self._cola.get()
+            if primero is _FIN:
+                return
+
+            lote = [primero]
+            limite = time.monotonic() + self.batch_ms / 1000
+            detener = False
+
+            while len(lote) < self.batch_size:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    evento = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if evento is _FIN:
+                    detener = True
+                    break
+                lote.append(evento)
+
+            self._escribir(lote)
+            if detener:
+                return
+
+    def _escribir(self, lote: List[Tuple]) -> None:
+        """Persiste un lote sin propagar errores al hilo escritor"""
+        try:
+            if not self._escritor(lote):
+                logger.error(f"No se pudo persistir un lote de {len(lote)} eventos de auditoría")
+        except Exception as e:
+            logger.error(f"Error en el escritor de auditoría: {e}")
+
+    def drenar(self, timeout: float = 5.0) -> None:
+        """
+        Detiene el hilo escritor y persiste los eventos pendientes.
+        Registrado en atexit; puede invocarse manualmente en un apagado ordenado.
+        """
+        hilo = self._hilo
+        if hilo is not None and self._pid == os.getpid() and hilo.is_alive():
+            self._cola.put_nowait(_FIN)
+            hilo.join(timeout)
+
+        pendientes = []
+        while True:
+            try:
+                evento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if evento is not _FIN:
+                pendientes.append(evento)
+
+        if pendientes:
+            self._escribir(pendientes)
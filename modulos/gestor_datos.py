@@ -2,28 +2,125 @@
 Capa de Persistencia - DatabaseManager
 Arquitectura: Repository Pattern con manejo robusto de excepciones y Connection Pooling
 """
+import atexit
 import sqlite3
 import datetime
 import os
 import logging
 import threading
-from typing import Optional, List, Dict, Tuple
+import time
+from typing import Optional, List, Dict, Tuple, Iterator, Iterable
 from contextlib import contextmanager
+from pathlib import Path
+
+from modulos.cola_auditoria import AuditLogQueue
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
+# Credenciales de fábrica (admin/admin123, operador/oper123) con su hash bcrypt
+# precalculado (costo 12): sembrar la BD no paga el hash, lento a propósito
+USUARIOS_POR_DEFECTO = (
+    ('admin', '$2b$12$/QuMNln7.rzguTKBg/pacOjePcXqbVpfp1C0ZRdzyzm0OsTCjYpb2',
+     'admin', 'Administrador del Sistema', 'admin@universidad.edu'),
+    ('operador', '$2b$12$49XpW9XqzvXkctKTVvPaG.SwYALHZ1zAzuQihA/S/MCBIDbep3GY6',
+     'operador', 'Operador de Audio', 'operador@universidad.edu'),
+)
+
+
+def _escapar_like(texto: str) -> str:
+    """Neutraliza los comodines de LIKE (%, _) y el carácter de escape en la entrada del usuario"""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 class DatabaseManager:
     """
     Gestiona todas las operaciones de persistencia del sistema.
     Implementa patrón Repository con Connection Pooling para aislar la lógica de acceso a datos.
     Thread-safe con locks para operaciones concurrentes.
+    Las consultas devuelven sqlite3.Row (acceso por nombre o posición, sin copiar
+    a dict); el proveedor JSON de la app los serializa directamente.
     """
     
     _instance = None
     _lock = threading.Lock()
     
-    def __new__(cls, db_path: str = "database/auditorio.db"):
+    # Segundos durante los que se reutiliza el último health_check
+    CACHE_TTL = 1.0
+    
+    # Espera máxima (segundos) por un lock de otro proceso antes de SQLITE_BUSY;
+    # menor que el timeout de los workers de gunicorn (30 s)
+    BUSY_TIMEOUT = 5.0
+    
+    # Segundos entre ejecuciones de PRAGMA optimize (estadísticas del planificador)
+    INTERVALO_OPTIMIZE = 4 * 3600
+    
+    # Fracción de páginas libres a partir de la cual conviene un VACUUM completo
+    UMBRAL_FRAGMENTACION = 0.25
+    
+    # Sentencias frecuentes: texto constante para reutilizar la sentencia preparada
+    # (la caché de sqlite3 se indexa por el texto exacto; cached_statements=256 en _conectar)
+    _SQL_INSERT_EVENTO = '''
+        INSERT INTO logs_auditoria
+        (fecha, nivel, usuario, evento, estado_previo, estado_nuevo,
+         detalles, origen_ip, user_agent)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    # Escritura inmediata: SQLite pone la fecha (hora local, como el resto de `fecha`)
+    _SQL_INSERT_EVENTO_AHORA = '''
+        INSERT INTO logs_auditoria
+        (fecha, nivel, usuario, evento, estado_previo, estado_nuevo,
+         detalles, origen_ip, user_agent)
+        VALUES (datetime('now', 'localtime'), ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    _SQL_UPSERT_ESTADO = '''
+        INSERT INTO estado_sistema (clave, valor, actualizado)
+        VALUES (?, ?, datetime('now', 'localtime'))
+        ON CONFLICT(clave) DO UPDATE SET
+            valor = excluded.valor,
+            actualizado = excluded.actualizado
+    '''
+    # Columnas actualizables de usuarios (en el orden de _SQL_UPDATE_USUARIO);
+    # NULL conserva el valor actual, así una única sentencia sirve para cualquier combinación
+    _CAMPOS_USUARIO = ('username', 'password_hash', 'rol', 'nombre_completo', 'email', 'activo')
+    # Sentencia fija: por columna, un indicador (¿viene en los datos?) y el valor;
+    # así un None explícito sí pone NULL y una clave ausente conserva el valor actual
+    _SQL_UPDATE_USUARIO = '''
+        UPDATE usuarios SET
+            username = CASE WHEN ? THEN ? ELSE username END,
+            password_hash = CASE WHEN ? THEN ? ELSE password_hash END,
+            rol = CASE WHEN ? THEN ? ELSE rol END,
+            nombre_completo = CASE WHEN ? THEN ? ELSE nombre_completo END,
+            email = CASE WHEN ? THEN ? ELSE email END,
+            activo = CASE WHEN ? THEN ? ELSE activo END
+        WHERE id = ?
+    '''
+    
+    # Lecturas de las rutas más consultadas (polling del dashboard y login)
+    _SQL_ULTIMOS_LOGS = '''
+        SELECT id, fecha, nivel, COALESCE(usuario, 'Sistema') AS usuario, evento,
+               COALESCE(detalles, '') AS detalle, origen_ip AS ip
+        FROM logs_auditoria
+        WHERE id < ?
+        ORDER BY id DESC
+        LIMIT ?
+    '''
+    _SQL_CONTAR_LOGS = "SELECT valor FROM contadores WHERE nombre = 'logs_auditoria'"
+    _SQL_VERSION_LOGS = '''
+        SELECT COALESCE(MAX(id), 0),
+               (SELECT valor FROM contadores WHERE nombre = 'logs_auditoria')
+        FROM logs_auditoria
+    '''
+    _SQL_SELECT_ESTADO = "SELECT clave, valor FROM estado_sistema"
+    _SQL_SELECT_USUARIO = '''
+        SELECT id, username, password_hash, rol, activo
+        FROM usuarios
+        WHERE username = ?
+    '''
+    # Cota superior de los id: sin cursor, `id < ?` abarca toda la tabla con la misma sentencia
+    _SIN_CURSOR = 2 ** 63 - 1
+    
+    def __new__(cls, *args, **kwargs):
         """Implementación de Singleton thread-safe"""
         if cls._instance is None:
             with cls._lock:
@@ -32,75 +129,339 @@ class DatabaseManager:
                     cls._instance._initialized = False
         return cls._instance
     
-    def __init__(self, db_path: str = "database/auditorio.db"):
-        """Inicializa el gestor de base de datos con connection pooling"""
+    def __init__(
+        self,
+        db_path: str = "database/auditorio.db",
+        batch_size: int = AuditLogQueue.BATCH_SIZE,
+        batch_ms: int = AuditLogQueue.BATCH_MS,
+        estado_ttl: float = 1.0,
+        vacuum_inicial: bool = False
+    ):
+        """
+        Inicializa el gestor de base de datos con connection pooling.
+        batch_size y batch_ms configuran la cola de escritura de auditoría;
+        estado_ttl, la vigencia de la caché de obtener_estado.
+        Con vacuum_inicial se compacta al arrancar una BD existente cuyas
+        páginas libres superen UMBRAL_FRAGMENTACION.
+        db_path admite URIs de SQLite (`file:...`); con
+        `file:nombre?mode=memory&cache=shared` todas las conexiones del proceso
+        comparten una misma BD en memoria mientras la de escritura siga abierta.
+        """
         if self._initialized:
             return
             
         self.db_path = db_path
-        self._local = threading.local()
+        self._es_uri = db_path.startswith('file:')
+        self._en_memoria = db_path == ':memory:' or (
+            self._es_uri and (db_path.startswith('file::memory:') or 'mode=memory' in db_path)
+        )
+        self._local = threading.local()          # Conexiones de lectura por thread
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._escritor: Optional[int] = None      # Thread dentro de un bloque de escritura
+        self._conexiones_heredadas = []
+        self._ultimo_optimize = 0.0
+        # Registrado antes que la cola: atexit es LIFO y los eventos pendientes se drenan primero
+        atexit.register(self.cerrar)
+        self._hc_cache: Optional[Dict] = None
+        self._hc_ts = 0.0
+        self._hc_modo = 'full'
+        # Caché de estado_sistema con escritura directa (write-through) en actualizar_estado;
+        # el TTL acota la desactualización ante escrituras de otros procesos
+        self.estado_ttl = estado_ttl
+        self._estado_cache: Optional[Dict[str, str]] = None
+        self._estado_ts = 0.0
+        self._estado_lock = threading.Lock()
+        # Eventos de auditoría diferidos: un hilo los persiste por lotes con registrar_eventos
+        self._cola_eventos = AuditLogQueue(self.registrar_eventos, batch_size, batch_ms)
         self._verificar_carpeta()
+        if vacuum_inicial and self.fragmentacion() > self.UMBRAL_FRAGMENTACION:
+            self.vacuum()
         self._inicializar_tablas()
         self._initialized = True
         logger.info(f"DatabaseManager inicializado: {db_path}")
 
     def _verificar_carpeta(self) -> None:
         """Crea la carpeta database si no existe"""
+        if self._es_uri or self._en_memoria:
+            return
         carpeta = os.path.dirname(self.db_path)
         if carpeta and not os.path.exists(carpeta):
             os.makedirs(carpeta)
             logger.info(f"Carpeta creada: {carpeta}")
     
+    def _conectar(self, solo_lectura: bool = False) -> sqlite3.Connection:
+        """
+        Abre una conexión nueva con los PRAGMAs de rendimiento aplicados.
+        journal_mode es persistente en el archivo; el resto es por conexión.
+        Las conexiones de lectura se abren con mode=ro: SQLite rechaza cualquier escritura.
+        """
+        if not solo_lectura:
+            destino = self.db_path
+        elif self._es_uri:
+            destino = self.db_path + ('&' if '?' in self.db_path else '?') + 'mode=ro'
+        else:
+            destino = Path(os.path.abspath(self.db_path)).as_uri() + '?mode=ro'
+        conn = sqlite3.connect(
+            destino,
+            uri=solo_lectura or self._es_uri,
+            check_same_thread=False,
+            timeout=self.BUSY_TIMEOUT,  # Equivale a PRAGMA busy_timeout
+            cached_statements=256,  # Sentencias preparadas reutilizadas por conexión
+            isolation_level=None    # Transacciones explícitas en _transaccion
+        )
+        conn.row_factory = sqlite3.Row
+        # WAL: lectores concurrentes durante las escrituras; NORMAL: fsync sólo en checkpoint.
+        # Una BD en memoria no admite WAL (siempre usa journal_mode=memory)
+        if not solo_lectura and not self._en_memoria:
+            # auto_vacuum sólo se puede fijar en un archivo nuevo y antes de pasar a WAL
+            # (en una BD existente se ignora); permite liberar páginas con incremental_vacuum
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            modo = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if modo.lower() != 'wal':
+                logger.warning(f"No se pudo activar WAL (journal_mode={modo})")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Temporales en RAM, lecturas vía mmap (256 MB) y ~20 MB de caché de páginas
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-20000")
+        # SQLite no valida las FOREIGN KEY salvo que se active en cada conexión
+        conn.execute("PRAGMA foreign_keys=ON")
+        if not solo_lectura:
+            # Acota el muestreo de ANALYZE que hace PRAGMA optimize en tablas grandes
+            conn.execute("PRAGMA analysis_limit=1000")
+        return conn
+    
+    @staticmethod
     @contextmanager
-    def _get_connection(self):
+    def _transaccion(conn: sqlite3.Connection, inmediata: bool = False):
         """
-        Context manager para obtener conexión thread-safe.
-        Cada thread obtiene su propia conexión desde el thread-local storage.
-        """
-        if not hasattr(self._local, 'connection') or self._local.connection is None:
-            self._local.connection = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,
-                timeout=30.0
-            )
-            self._local.connection.row_factory = sqlite3.Row
-            # Habilitar WAL mode para mejor concurrencia
-            self._local.connection.execute("PRAGMA journal_mode=WAL")
-            self._local.connection.execute("PRAGMA synchronous=NORMAL")
+        Ejecuta el bloque en una transacción explícita (BEGIN/COMMIT/ROLLBACK);
+        si ya hay una en curso en la conexión, el bloque se integra en ella.
+        Con `inmediata` se abre con BEGIN IMMEDIATE: el lock de escritura se toma
+        al inicio (esperando con el busy timeout) en lugar de al primer cambio.
+        """
+        propia = not conn.in_transaction
+        if propia:
+            conn.execute("BEGIN IMMEDIATE" if inmediata else "BEGIN")
             
         try:
-            yield self._local.connection
-        except Exception as e:
-            self._local.connection.rollback()
-            logger.error(f"Error en transacción de BD: {e}")
+            yield conn
+        except BaseException as e:
+            # BaseException: un generador cerrado a medias (GeneratorExit) no debe dejar la transacción abierta
+            if propia and conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if isinstance(e, Exception):
+                logger.error(f"Error en transacción de BD: {e}")
             raise
         else:
-            self._local.connection.commit()
+            if propia and conn.in_transaction:
+                conn.execute("COMMIT")
+    
+    @contextmanager
+    def _get_connection(self):
+        """
+        Context manager de escritura: una única conexión compartida por el proceso,
+        serializada con un lock reentrante (SQLite admite un solo escritor a la vez).
+        Las transacciones se abren con BEGIN IMMEDIATE: entre procesos (workers)
+        el lock se espera al inicio con el busy timeout, en lugar de fallar con
+        SQLITE_BUSY al promover a escritura una transacción diferida.
+        """
+        with self._write_lock:
+            if self._write_conn is None:
+                self._write_conn = self._conectar()
+            externo = self._escritor
+            self._escritor = threading.get_ident()
+            try:
+                with self._transaccion(self._write_conn, inmediata=True) as conn:
+                    yield conn
+            finally:
+                self._escritor = externo
+            # Mantenimiento periódico al terminar la escritura más externa (sin hilo ni timer)
+            if externo is None and time.monotonic() - self._ultimo_optimize >= self.INTERVALO_OPTIMIZE:
+                self._optimizar(self._write_conn)
+                self._vacuum_incremental(1000)
+    
+    def _optimizar(self, conn: sqlite3.Connection, mascara: Optional[int] = None) -> None:
+        """
+        Ejecuta PRAGMA optimize: actualiza sqlite_stat1 sólo en las tablas que lo
+        necesitan (prácticamente gratis si nada cambió).
+        """
+        try:
+            conn.execute("PRAGMA optimize" if mascara is None else f"PRAGMA optimize={mascara:#x}")
+            self._ultimo_optimize = time.monotonic()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo ejecutar PRAGMA optimize: {e}")
+    
+    @contextmanager
+    def _get_lectura(self):
+        """
+        Context manager de lectura: cada thread obtiene su propia conexión de
+        solo lectura desde el thread-local storage, sin esperar al escritor.
+        Dentro de un bloque de escritura del mismo thread se usa la conexión de
+        escritura para ver sus cambios aún no confirmados; una BD en memoria
+        también se lee por ella (`:memory:` no puede abrirse dos veces y, con
+        cache=shared, un lector quedaría bloqueado por las tablas del escritor).
+        """
+        if self._escritor == threading.get_ident() or self._en_memoria:
+            with self._get_connection() as conn:
+                yield conn
+            return
+        
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = self._conectar(solo_lectura=True)
+        
+        with self._transaccion(self._local.connection) as conn:
+            yield conn
+    
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupa varias operaciones en una sola transacción del thread actual.
+        Los métodos invocados dentro del bloque se integran en ella, por lo
+        que las lecturas comparten una misma instantánea de la base de datos.
+        """
+        with self._get_connection() as conn:
+            yield conn
     
     def close_connection(self):
-        """Cierra la conexión del thread actual"""
-        if hasattr(self._local, 'connection') and self._local.connection:
+        """Cierra la conexión de lectura del thread actual"""
+        if getattr(self._local, 'connection', None) is not None:
             self._local.connection.close()
             self._local.connection = None
             logger.debug("Conexión cerrada para el thread actual")
     
-    def health_check(self) -> Dict[str, any]:
+    def _vacuum_incremental(self, paginas: int) -> None:
+        """
+        Devuelve al sistema hasta `paginas` páginas libres (requiere auto_vacuum=INCREMENTAL).
+        Se usa executescript porque execute() avanza el PRAGMA un solo paso (una página);
+        como executescript confirma la transacción en curso, no se ejecuta dentro de una.
+        """
+        if self._en_memoria:
+            return
+        with self._write_lock:
+            if self._write_conn is None or self._write_conn.in_transaction:
+                return
+            try:
+                self._write_conn.executescript(f"PRAGMA incremental_vacuum({int(paginas)})")
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo ejecutar incremental_vacuum: {e}")
+    
+    # ==================== MANTENIMIENTO ====================
+    
+    def fragmentacion(self) -> float:
+        """
+        Fracción de páginas libres del archivo (freelist_count / page_count).
+        Se lee por la conexión de escritura en autocommit, como vacuum(): no abre
+        BEGIN IMMEDIATE ni toma el lock de escritura de SQLite para un diagnóstico.
+        """
+        with self._write_lock:
+            try:
+                if self._write_conn is None:
+                    self._write_conn = self._conectar()
+                conn = self._write_conn
+                paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+                libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                return libres / paginas if paginas else 0.0
+            except sqlite3.Error as e:
+                logger.error(f"Error al medir fragmentación: {e}")
+                return 0.0
+    
+    def vacuum(self) -> bool:
+        """
+        Reescribe la BD completa (VACUUM): compacta páginas y elimina la fragmentación.
+        Bloquea las escrituras mientras dura y necesita espacio libre en disco
+        similar al tamaño de la BD; pensado para mantenimiento, no para cada petición.
+        """
+        with self._write_lock:
+            if self._write_conn is None:
+                self._write_conn = self._conectar()
+            if self._write_conn.in_transaction:
+                logger.error("VACUUM no puede ejecutarse dentro de una transacción")
+                return False
+            try:
+                inicio = time.monotonic()
+                self._write_conn.execute("VACUUM")
+                logger.info(f"VACUUM completado en {time.monotonic() - inicio:.2f}s")
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Error al ejecutar VACUUM: {e}")
+                return False
+    
+    def optimize(self) -> None:
+        """Actualiza las estadísticas del planificador (PRAGMA optimize) a demanda"""
+        with self._write_lock:
+            if self._write_conn is None:
+                self._write_conn = self._conectar()
+            self._optimizar(self._write_conn)
+    
+    def cerrar(self) -> None:
+        """
+        Cierra la conexión de escritura del proceso ejecutando antes PRAGMA optimize.
+        Registrado en atexit; la conexión se reabre sola si se vuelve a escribir.
+        """
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._optimizar(self._write_conn)
+                self._write_conn.close()
+                self._write_conn = None
+                logger.debug("Conexión de escritura cerrada")
+    
+    def reiniciar_conexiones(self) -> None:
+        """
+        Descarta las conexiones heredadas tras un fork (ej: workers de gunicorn).
+        No se cierran: cerrar en el hijo una conexión abierta por el padre puede
+        hacer checkpoint o borrar el WAL que el padre sigue usando.
+        El lock también se recrea: pudo quedar tomado por un thread del padre.
+        """
+        self._conexiones_heredadas.append((self._local, self._write_conn))
+        self._local = threading.local()
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        self._escritor = None
+        self._estado_lock = threading.Lock()
+        logger.debug(f"Conexiones reiniciadas en el proceso {os.getpid()}")
+    
+    def health_check(self, use_cache: bool = True, mode: str = 'full') -> Dict[str, any]:
         """
         Verifica el estado de salud de la base de datos.
+        PRAGMA integrity_check recorre toda la BD: llamadas consecutivas dentro
+        de CACHE_TTL segundos reutilizan el último resultado.
+        
+        Args:
+            use_cache: False para forzar una verificación nueva
+            mode: 'full' (integrity_check) o 'quick' (quick_check, omite la
+                  validación del contenido de los índices)
         
         Returns:
             Diccionario con información del estado de la BD
         """
+        if mode not in ('full', 'quick'):
+            raise ValueError(f"Modo de verificación inválido: {mode}")
+        
+        # Un resultado 'full' reciente también satisface una verificación 'quick'
+        if (use_cache and self._hc_cache is not None
+                and time.monotonic() - self._hc_ts < self.CACHE_TTL
+                and (self._hc_modo == mode or self._hc_modo == 'full')):
+            return self._hc_cache
+        
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 
                 # Verificar integridad
-                cursor.execute("PRAGMA integrity_check")
+                cursor.execute("PRAGMA integrity_check" if mode == 'full' else "PRAGMA quick_check")
                 integrity = cursor.fetchone()[0]
                 
-                # Tamaño de BD
-                db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+                # Modo de diario efectivo (WAL persiste en el archivo entre aperturas)
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+                
+                # Tamaño de BD (una sola llamada a stat)
+                try:
+                    db_size = os.stat(self.db_path).st_size
+                except OSError:
+                    db_size = 0
                 
                 # Conteo de tablas
                 cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'")
@@ -110,15 +471,18 @@ class DatabaseManager:
                 cursor.execute("SELECT COUNT(*) FROM logs_auditoria")
                 total_logs = cursor.fetchone()[0]
                 
-                return {
+                resultado = {
                     'status': 'healthy' if integrity == 'ok' else 'error',
                     'integrity': integrity,
+                    'journal_mode': journal_mode,
                     'db_size_bytes': db_size,
                     'db_size_mb': round(db_size / (1024 * 1024), 2),
                     'num_tables': num_tables,
                     'total_logs': total_logs,
                     'db_path': self.db_path
                 }
+                self._hc_cache, self._hc_ts, self._hc_modo = resultado, time.monotonic(), mode
+                return resultado
         except Exception as e:
             logger.error(f"Error en health_check: {e}")
             return {'status': 'error', 'error': str(e)}
@@ -149,14 +513,15 @@ class DatabaseManager:
                     )
                 ''')
                 
-                # Tabla de estado del sistema (reemplaza estado en RAM)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS estado_sistema (
+                # Tabla de estado del sistema (reemplaza estado en RAM).
+                # WITHOUT ROWID: la clave primaria es la propia tabla, sin índice aparte
+                self._crear_tabla_sin_rowid(cursor, 'estado_sistema', '''
+                    CREATE TABLE IF NOT EXISTS {} (
                         clave TEXT PRIMARY KEY,
                         valor TEXT NOT NULL,
                         actualizado DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+                    ) WITHOUT ROWID
+                ''', 'clave, valor, actualizado')
                 
                 # Tabla de usuarios con roles
                 cursor.execute('''
@@ -173,19 +538,18 @@ class DatabaseManager:
                     )
                 ''')
                 
-                # Tabla de configuraciones del sistema
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS configuraciones (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        clave TEXT UNIQUE NOT NULL,
+                # Tabla de configuraciones del sistema (clave natural, WITHOUT ROWID)
+                self._crear_tabla_sin_rowid(cursor, 'configuraciones', '''
+                    CREATE TABLE IF NOT EXISTS {} (
+                        clave TEXT PRIMARY KEY,
                         valor TEXT NOT NULL,
                         tipo TEXT DEFAULT 'string',
                         descripcion TEXT,
                         categoria TEXT,
                         actualizado DATETIME DEFAULT CURRENT_TIMESTAMP,
                         actualizado_por TEXT
-                    )
-                ''')
+                    ) WITHOUT ROWID
+                ''', 'clave, valor, tipo, descripcion, categoria, actualizado, actualizado_por')
                 
                 # Tabla de sesiones para auditoría avanzada
                 cursor.execute('''
@@ -201,67 +565,115 @@ class DatabaseManager:
                     )
                 ''')
                 
-                # Inicializar estado por defecto si está vacío
-                cursor.execute("SELECT COUNT(*) FROM estado_sistema")
-                if cursor.fetchone()[0] == 0:
-                    estado_inicial = [
-                        ('modo_actual', 'STANDBY'),
-                        ('carga_cpu', '5%'),
-                        ('latencia', '0ms'),
-                        ('sistema_activo', 'true')
-                    ]
-                    cursor.executemany(
-                        "INSERT INTO estado_sistema (clave, valor) VALUES (?, ?)",
-                        estado_inicial
-                    )
+                # Valores por defecto: INSERT OR IGNORE es idempotente y sólo agrega
+                # las claves que falten, sin consultar antes cuántas filas hay
+                estado_inicial = [
+                    ('modo_actual', 'STANDBY'),
+                    ('carga_cpu', '5%'),
+                    ('latencia', '0ms'),
+                    ('sistema_activo', 'true')
+                ]
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO estado_sistema (clave, valor, actualizado) "
+                    "VALUES (?, ?, datetime('now', 'localtime'))",
+                    estado_inicial
+                )
+                
+                configs_default = [
+                    ('max_volumen', '100', 'integer', 'Volumen máximo permitido', 'audio'),
+                    ('timeout_sesion', '3600', 'integer', 'Tiempo de sesión en segundos', 'seguridad'),
+                    ('modo_debug', 'false', 'boolean', 'Activar modo debug', 'sistema'),
+                    ('backup_automatico', 'true', 'boolean', 'Realizar backup automático', 'sistema')
+                ]
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO configuraciones (clave, valor, tipo, descripcion, categoria) VALUES (?, ?, ?, ?, ?)",
+                    configs_default
+                )
                 
-                # Insertar usuarios por defecto si no existen
-                cursor.execute("SELECT COUNT(*) FROM usuarios")
-                if cursor.fetchone()[0] == 0:
-                    from werkzeug.security import generate_password_hash
-                    usuarios_default = [
-                        ('admin', generate_password_hash('admin123'), 'admin', 'Administrador del Sistema', 'admin@universidad.edu'),
-                        ('operador', generate_password_hash('oper123'), 'operador', 'Operador de Audio', 'operador@universidad.edu')
-                    ]
+                # Usuarios por defecto sólo en una BD sin usuarios: no debe recrearse
+                # una cuenta que se renombró o eliminó
+                if cursor.execute("SELECT 1 FROM usuarios LIMIT 1").fetchone() is None:
                     cursor.executemany(
-                        "INSERT INTO usuarios (username, password_hash, rol, nombre_completo, email) VALUES (?, ?, ?, ?, ?)",
-                        usuarios_default
+                        "INSERT OR IGNORE INTO usuarios (username, password_hash, rol, nombre_completo, email) VALUES (?, ?, ?, ?, ?)",
+                        USUARIOS_POR_DEFECTO
                     )
                 
-                # Insertar configuraciones por defecto
-                cursor.execute("SELECT COUNT(*) FROM configuraciones")
-                if cursor.fetchone()[0] == 0:
-                    configs_default = [
-                        ('max_volumen', '100', 'integer', 'Volumen máximo permitido', 'audio'),
-                        ('timeout_sesion', '3600', 'integer', 'Tiempo de sesión en segundos', 'seguridad'),
-                        ('modo_debug', 'false', 'boolean', 'Activar modo debug', 'sistema'),
-                        ('backup_automatico', 'true', 'boolean', 'Realizar backup automático', 'sistema')
-                    ]
-                    cursor.executemany(
-                        "INSERT INTO configuraciones (clave, valor, tipo, descripcion, categoria) VALUES (?, ?, ?, ?, ?)",
-                        configs_default
+                # Contador de registros mantenido por triggers (evita COUNT(*) por página)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS contadores (
+                        nombre TEXT PRIMARY KEY,
+                        valor INTEGER NOT NULL DEFAULT 0
                     )
+                ''')
+                
+                cursor.execute('''
+                    INSERT OR IGNORE INTO contadores (nombre, valor)
+                    SELECT 'logs_auditoria', COUNT(*) FROM logs_auditoria
+                ''')
+                
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS trg_logs_contador_insert
+                    AFTER INSERT ON logs_auditoria
+                    BEGIN
+                        UPDATE contadores SET valor = valor + 1 WHERE nombre = 'logs_auditoria';
+                    END
+                ''')
+                
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS trg_logs_contador_delete
+                    AFTER DELETE ON logs_auditoria
+                    BEGIN
+                        UPDATE contadores SET valor = valor - 1 WHERE nombre = 'logs_auditoria';
+                    END
+                ''')
                 
                 # Índices para optimización de consultas
                 # Verificar si la columna usuario existe antes de crear índice
                 cursor.execute("PRAGMA table_info(logs_auditoria)")
                 columns = [col[1] for col in cursor.fetchall()]
                 
+                # (fecha, nivel) cubre el conteo por día y nivel de obtener_eventos_por_dia
+                # y sirve también los rangos/orden por fecha del índice simple que reemplaza
+                cursor.execute("DROP INDEX IF EXISTS idx_logs_fecha")
                 cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_logs_fecha 
-                    ON logs_auditoria(fecha DESC)
+                    CREATE INDEX IF NOT EXISTS idx_logs_fecha_nivel 
+                    ON logs_auditoria(fecha, nivel)
                 ''')
                 
                 if 'usuario' in columns:
+                    # (usuario, fecha) cubre COUNT y MAX(fecha) de la actividad por usuario;
+                    # reemplaza al índice simple sobre usuario (prefijo redundante)
+                    cursor.execute("DROP INDEX IF EXISTS idx_logs_usuario")
                     cursor.execute('''
-                        CREATE INDEX IF NOT EXISTS idx_logs_usuario 
-                        ON logs_auditoria(usuario)
+                        CREATE INDEX IF NOT EXISTS idx_logs_usuario_fecha 
+                        ON logs_auditoria(usuario, fecha)
                     ''')
                 
+                # Conteo por nivel sólo con el índice (estadísticas generales)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_logs_nivel
+                    ON logs_auditoria(nivel)
+                ''')
+
+                # Eventos de un tipo dentro de un rango de fechas (cambios de hoy)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_logs_evento_fecha
+                    ON logs_auditoria(evento, fecha)
+                ''')
+
+                # Índice de cobertura para el uso por modo (agrupa sin leer la tabla)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_logs_evento_modo 
+                    ON logs_auditoria(evento, estado_nuevo, usuario)
+                ''')
+                
                 # Índices adicionales para las nuevas tablas
+                # El UNIQUE de username ya crea un índice; el índice cubriente
+                # resuelve el listado resumido sin leer la tabla
+                cursor.execute("DROP INDEX IF EXISTS idx_usuarios_username")
                 cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_usuarios_username 
-                    ON usuarios(username)
+                    CREATE INDEX IF NOT EXISTS idx_usuarios_resumen 
+                    ON usuarios(username, rol, activo)
                 ''')
                 
                 cursor.execute('''
@@ -274,12 +686,72 @@ class DatabaseManager:
                     ON configuraciones(categoria)
                 ''')
                 
+                # Análisis inicial: 0x10002 analiza también las tablas sin estadísticas previas
+                self._optimizar(conn, 0x10002)
+                
                 logger.info("Estructura de base de datos inicializada correctamente")
                 
         except sqlite3.Error as e:
             logger.error(f"Error al inicializar tablas: {e}")
             raise
 
+    @staticmethod
+    def _crear_tabla_sin_rowid(cursor: sqlite3.Cursor, tabla: str, ddl: str, columnas: str) -> None:
+        """
+        Crea `tabla` con el DDL dado (WITHOUT ROWID; `{}` es el nombre de la tabla).
+        Si existe una versión anterior con rowid, copia `columnas` a una tabla nueva,
+        elimina la vieja y renombra la nueva; sus índices se recrean más adelante.
+        """
+        fila = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+        ).fetchone()
+        if fila is None:
+            cursor.execute(ddl.format(tabla))
+            return
+        if 'WITHOUT ROWID' in fila[0].upper():
+            return
+        
+        temporal = f"{tabla}_migracion"
+        cursor.execute(f"DROP TABLE IF EXISTS {temporal}")
+        cursor.execute(ddl.format(temporal))
+        cursor.execute(f"INSERT INTO {temporal} ({columnas}) SELECT {columnas} FROM {tabla}")
+        cursor.execute(f"DROP TABLE {tabla}")
+        cursor.execute(f"ALTER TABLE {temporal} RENAME TO {tabla}")
+        logger.info(f"Tabla {tabla} migrada a WITHOUT ROWID")
+    
+    def resetear(self) -> bool:
+        """
+        Elimina todas las tablas y recrea la estructura con sus datos por defecto.
+        Todo ocurre en una sola transacción sobre el mismo archivo: no se borra
+        ni se recrea el archivo, y las páginas liberadas se reutilizan.
+        
+        Returns:
+            True si se reseteó correctamente
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT name FROM sqlite_master
+                    WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+                ''')
+                tablas = [row[0] for row in cursor.fetchall()]
+                
+                # Índices y triggers se eliminan junto con su tabla
+                for tabla in tablas:
+                    cursor.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+                
+                self._inicializar_tablas()
+            
+            self._hc_cache = None
+            self._invalidar_estado()
+            logger.warning(f"Base de datos reseteada: {len(tablas)} tablas eliminadas y recreadas")
+            return True
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error al resetear base de datos: {e}")
+            return False
+
     def registrar_evento(
         self,
         evento: str,
@@ -289,10 +761,13 @@ class DatabaseManager:
         usuario: Optional[str] = None,
         estado_previo: Optional[str] = None,
         estado_nuevo: Optional[str] = None,
-        user_agent: Optional[str] = None
+        user_agent: Optional[str] = None,
+        sync: bool = False
     ) -> bool:
         """
-        Inserta un log de auditoría con información completa.
+        Registra un log de auditoría con información completa.
+        Por defecto el evento se encola y se persiste en segundo plano junto
+        con otros (una transacción por lote); sync=True lo inserta en el acto.
         
         Args:
             evento: Tipo de evento (ej: CAMBIO_MODO, LOGIN, ERROR)
@@ -303,22 +778,23 @@ class DatabaseManager:
             estado_previo: Estado del sistema antes del cambio
             estado_nuevo: Estado del sistema después del cambio
             user_agent: User-Agent del navegador/cliente
+            sync: True para escribir sin pasar por la cola (ej: scripts, pruebas)
             
         Returns:
-            True si se registró correctamente, False en caso de error
+            True si se encoló o registró correctamente, False en caso de error
         """
+        fila = (nivel, usuario, evento, estado_previo, estado_nuevo,
+                detalles, ip, user_agent)
+        
+        if not sync:
+            # La fecha se toma al encolar: el lote se escribe hasta batch_ms después
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._cola_eventos.encolar((now,) + fila)
+            return True
+        
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                cursor.execute('''
-                    INSERT INTO logs_auditoria 
-                    (fecha, nivel, usuario, evento, estado_previo, estado_nuevo, 
-                     detalles, origen_ip, user_agent)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (now, nivel, usuario, evento, estado_previo, estado_nuevo, 
-                      detalles, ip, user_agent))
+                conn.execute(self._SQL_INSERT_EVENTO_AHORA, fila)
                 
                 logger.debug(f"Evento registrado: {evento} por {usuario or 'anónimo'}")
                 return True
@@ -327,37 +803,135 @@ class DatabaseManager:
             logger.error(f"Error al registrar evento: {e}")
             return False
 
-    def obtener_ultimos_logs(self, limite: int = 20) -> List[Tuple]:
+    def registrar_eventos(self, eventos: Iterable[Tuple]) -> bool:
+        """
+        Inserta un lote de logs de auditoría en una sola transacción.
+        Una única sentencia preparada recorre todo el lote; acepta cualquier
+        iterable (ej: un generador) sin materializarlo en memoria.
+
+        Args:
+            eventos: Tuplas con el orden (fecha, nivel, usuario, evento, estado_previo,
+                     estado_nuevo, detalles, origen_ip, user_agent)
+
+        Returns:
+            True si el lote se registró correctamente, False en caso de error
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.executemany(self._SQL_INSERT_EVENTO, eventos)
+
+                logger.debug(f"Lote de {cursor.rowcount} eventos registrado")
+                return True
+
+        except sqlite3.Error as e:
+            logger.error(f"Error al registrar lote de eventos: {e}")
+            return False
+
+    def flush(self) -> None:
+        """
+        Persiste los eventos de auditoría aún encolados.
+        También se ejecuta al terminar el proceso (atexit); la cola se
+        reactiva sola con el siguiente evento.
+        """
+        self._cola_eventos.drenar()
+
+    def obtener_ultimos_logs(self, limite: int = 20, after_id: Optional[int] = None) -> List[sqlite3.Row]:
         """
         Recupera el historial de eventos para el dashboard.
+        Paginación por keyset: `after_id` es el último id de la página anterior.
         
         Args:
             limite: Número máximo de registros a devolver
+            after_id: Devuelve sólo logs con id menor a este valor
             
         Returns:
-            Lista de tuplas con los logs ordenados por fecha descendente
+            Lista de filas (id, fecha, nivel, usuario, evento, detalle, ip)
+            ordenadas por id descendente; usuario y detalle nunca son NULL
         """
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, fecha, nivel, usuario, evento, detalles, origen_ip
-                    FROM logs_auditoria 
-                    ORDER BY id DESC 
-                    LIMIT ?
-                ''', (limite,))
+                cursor.execute(
+                    self._SQL_ULTIMOS_LOGS,
+                    (self._SIN_CURSOR if after_id is None else after_id, limite)
+                )
                 return cursor.fetchall()
                 
         except sqlite3.Error as e:
             logger.error(f"Error al obtener logs: {e}")
             return []
-    
+
+    def contar_logs(self) -> int:
+        """
+        Devuelve el total de logs de auditoría.
+        Lee el contador mantenido por triggers en lugar de ejecutar COUNT(*).
+        """
+        try:
+            with self._get_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self._SQL_CONTAR_LOGS)
+                row = cursor.fetchone()
+                return row[0] if row else 0
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error al contar logs: {e}")
+            return 0
+
+    def version_logs(self) -> Optional[Tuple[int, int]]:
+        """
+        Devuelve (id máximo, total) de los logs de auditoría.
+        Cambia con cada inserción o borrado; sirve como validador de caché HTTP.
+        
+        Returns:
+            Tupla (ultimo_id, total) o None si la consulta falla
+        """
+        try:
+            with self._get_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self._SQL_VERSION_LOGS)
+                ultimo_id, total = cursor.fetchone()
+                return ultimo_id, total or 0
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error al obtener versión de logs: {e}")
+            return None
+
+    def iter_ultimos_logs(self, limite: int = 1000, tamano_bloque: int = 500) -> Iterator[sqlite3.Row]:
+        """
+        Recorre el historial de eventos sin materializarlo completo en memoria.
+        Pensado para exportaciones grandes que se envían en streaming.
+
+        Args:
+            limite: Número máximo de registros a recorrer
+            tamano_bloque: Filas leídas del cursor en cada fetchmany
+
+        Yields:
+            Filas con los logs ordenados por fecha descendente
+        """
+        try:
+            with self._get_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, fecha, nivel, usuario, evento, detalles, origen_ip
+                    FROM logs_auditoria
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (limite,))
+                while True:
+                    bloque = cursor.fetchmany(tamano_bloque)
+                    if not bloque:
+                        break
+                    yield from bloque
+
+        except sqlite3.Error as e:
+            logger.error(f"Error al recorrer logs: {e}")
+
     # ==================== MÉTODOS PARA ADMINISTRACIÓN ====================
     
-    def obtener_todos_usuarios(self) -> List[Dict]:
+    def obtener_todos_usuarios(self) -> List[sqlite3.Row]:
         """Obtiene todos los usuarios del sistema"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT id, username, rol, nombre_completo, email, activo, 
@@ -365,11 +939,40 @@ class DatabaseManager:
                     FROM usuarios 
                     ORDER BY fecha_creacion DESC
                 ''')
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener usuarios: {e}")
             return []
     
+    def listar_usuarios_resumen(self) -> List[sqlite3.Row]:
+        """
+        Lista usuarios con sólo las columnas del resumen (username, rol, activo).
+        Consulta resuelta íntegramente desde idx_usuarios_resumen.
+        """
+        try:
+            with self._get_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT username, rol, activo
+                    FROM usuarios
+                    ORDER BY username
+                ''')
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error al listar usuarios: {e}")
+            return []
+    
+    def obtener_usuario(self, username: str) -> Optional[sqlite3.Row]:
+        """Obtiene un usuario por username, incluyendo su hash de contraseña"""
+        try:
+            with self._get_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self._SQL_SELECT_USUARIO, (username,))
+                return cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error al obtener usuario: {e}")
+            return None
+
     def crear_usuario(self, username: str, password_hash: str, rol: str, 
                      nombre_completo: str = None, email: str = None) -> bool:
         """Crea un nuevo usuario"""
@@ -387,15 +990,26 @@ class DatabaseManager:
             return False
     
     def actualizar_usuario(self, user_id: int, datos: Dict) -> bool:
-        """Actualiza datos de un usuario"""
+        """
+        Actualiza datos de un usuario.
+        Sólo se aceptan las columnas de _CAMPOS_USUARIO; las ausentes conservan
+        su valor y un None explícito deja la columna en NULL.
+        """
+        desconocidos = datos.keys() - set(self._CAMPOS_USUARIO)
+        if desconocidos:
+            logger.error(f"Campos no permitidos al actualizar usuario: {sorted(desconocidos)}")
+            return False
+        
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-                campos = ', '.join([f"{k} = ?" for k in datos.keys()])
-                valores = list(datos.values()) + [user_id]
-                cursor.execute(f'''
-                    UPDATE usuarios SET {campos} WHERE id = ?
-                ''', valores)
+                conn.execute(
+                    self._SQL_UPDATE_USUARIO,
+                    tuple(
+                        parametro
+                        for campo in self._CAMPOS_USUARIO
+                        for parametro in (campo in datos, datos.get(campo))
+                    ) + (user_id,)
+                )
                 logger.info(f"Usuario actualizado: ID {user_id}")
                 return True
         except sqlite3.Error as e:
@@ -414,57 +1028,103 @@ class DatabaseManager:
             logger.error(f"Error al eliminar usuario: {e}")
             return False
     
-    def buscar_logs(self, filtros: Dict, limite: int = 50) -> List[Dict]:
-        """Busca logs con filtros avanzados"""
+    def buscar_logs(self, filtros: Dict, limite: int = 50) -> List[sqlite3.Row]:
+        """
+        Busca logs con filtros avanzados.
+        Paginación por keyset: el filtro `after_id` devuelve sólo logs con id menor.
+        """
         try:
-            with self._get_connection() as conn:
+            return list(self.iter_buscar_logs(filtros, limite))
+        except sqlite3.Error:
+            return []
+    
+    def iter_buscar_logs(self, filtros: Dict, limite: int = 50,
+                         tamano_bloque: int = 200) -> Iterator[sqlite3.Row]:
+        """
+        Versión en streaming de buscar_logs: recorre los resultados por bloques
+        con fetchmany, así la memoria queda acotada al bloque sea cual sea `limite`.
+        
+        Args:
+            filtros: usuario, nivel, fecha_desde, fecha_hasta, evento, after_id;
+                     usuario_exacto / evento_exacto comparan por igualdad (usa los
+                     índices por usuario y evento) en lugar de buscar una subcadena
+            limite: Número máximo de registros a recorrer
+            tamano_bloque: Filas leídas del cursor en cada fetchmany
+        
+        Yields:
+            Filas de logs ordenadas por id descendente
+        
+        Raises:
+            sqlite3.Error: Si la consulta falla; a diferencia de buscar_logs se
+                propaga, para que quien emite el resultado no lo dé por completo
+        """
+        try:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 
                 query = "SELECT * FROM logs_auditoria WHERE 1=1"
                 params = []
                 
-                if filtros.get('usuario'):
-                    query += " AND usuario LIKE ?"
-                    params.append(f"%{filtros['usuario']}%")
+                for campo in ('usuario', 'evento'):
+                    if filtros.get(campo):
+                        if filtros.get(f'{campo}_exacto'):
+                            query += f" AND {campo} = ?"
+                            params.append(filtros[campo])
+                        else:
+                            query += f" AND {campo} LIKE ? ESCAPE '\\'"
+                            # str(): el JSON puede traer números (p. ej. {"usuario": 5})
+                            params.append(f"%{_escapar_like(str(filtros[campo]))}%")
                 
                 if filtros.get('nivel'):
                     query += " AND nivel = ?"
                     params.append(filtros['nivel'])
                 
-                if filtros.get('fecha_desde'):
+                if filtros.get('fecha_desde') and filtros.get('fecha_hasta'):
+                    query += " AND fecha BETWEEN ? AND ?"
+                    params.extend((filtros['fecha_desde'], filtros['fecha_hasta']))
+                elif filtros.get('fecha_desde'):
                     query += " AND fecha >= ?"
                     params.append(filtros['fecha_desde'])
-                
-                if filtros.get('fecha_hasta'):
+                elif filtros.get('fecha_hasta'):
                     query += " AND fecha <= ?"
                     params.append(filtros['fecha_hasta'])
                 
-                if filtros.get('evento'):
-                    query += " AND evento LIKE ?"
-                    params.append(f"%{filtros['evento']}%")
+                if filtros.get('after_id'):
+                    query += " AND id < ?"
+                    params.append(int(filtros['after_id']))
                 
-                query += f" ORDER BY id DESC LIMIT ?"
+                query += " ORDER BY id DESC LIMIT ?"
                 params.append(limite)
                 
                 cursor.execute(query, params)
-                return [dict(row) for row in cursor.fetchall()]
+                while True:
+                    bloque = cursor.fetchmany(tamano_bloque)
+                    if not bloque:
+                        break
+                    yield from bloque
         except sqlite3.Error as e:
             logger.error(f"Error al buscar logs: {e}")
-            return []
+            raise
     
     def eliminar_logs_antiguos(self, dias: int = 30) -> int:
-        """Elimina logs más antiguos que X días"""
+        """
+        Elimina logs más antiguos que X días.
+        El límite se calcula en SQLite (hora local, como se guarda `fecha`) y el
+        borrado recorre el rango de idx_logs_fecha_nivel. Después se liberan
+        hasta 1000 páginas con incremental_vacuum, sin reescribir toda la BD.
+        """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                fecha_limite = datetime.datetime.now() - datetime.timedelta(days=dias)
                 cursor.execute('''
                     DELETE FROM logs_auditoria 
-                    WHERE fecha < ?
-                ''', (fecha_limite.strftime('%Y-%m-%d %H:%M:%S'),))
+                    WHERE fecha < datetime('now', 'localtime', ?)
+                ''', (f'-{int(dias)} days',))
                 eliminados = cursor.rowcount
                 logger.info(f"Logs eliminados: {eliminados}")
-                return eliminados
+            if eliminados:
+                self._vacuum_incremental(1000)
+            return eliminados
         except sqlite3.Error as e:
             logger.error(f"Error al eliminar logs: {e}")
             return 0
@@ -472,50 +1132,52 @@ class DatabaseManager:
     # ==================== MÉTODOS PARA ANALÍTICAS ====================
     
     def obtener_estadisticas_generales(self) -> Dict:
-        """Obtiene estadísticas generales del sistema"""
+        """
+        Obtiene estadísticas generales del sistema en una sola consulta.
+        Los totales salen del contador y de índices; el conteo por nivel se une
+        a la fila de totales con LEFT JOIN para no perderla si no hay eventos.
+        """
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Total de logs
-                cursor.execute("SELECT COUNT(*) FROM logs_auditoria")
-                total_logs = cursor.fetchone()[0]
-                
-                # Usuarios activos
-                cursor.execute("SELECT COUNT(*) FROM usuarios WHERE activo = 1")
-                usuarios_activos = cursor.fetchone()[0]
-                
-                # Eventos por nivel
-                cursor.execute('''
-                    SELECT nivel, COUNT(*) as cantidad 
-                    FROM logs_auditoria 
-                    GROUP BY nivel
-                ''')
-                eventos_nivel = dict(cursor.fetchall())
-                
-                # Cambios de modo hoy
-                cursor.execute('''
-                    SELECT COUNT(*) 
-                    FROM logs_auditoria 
-                    WHERE evento = 'CAMBIO_MODO' 
-                    AND DATE(fecha) = DATE('now')
-                ''')
-                cambios_hoy = cursor.fetchone()[0]
+            with self._get_lectura() as conn:
+                filas = conn.execute('''
+                    SELECT t.total_logs, t.usuarios_activos, t.cambios_hoy,
+                           n.nivel, n.cantidad
+                    FROM (
+                        SELECT
+                            (SELECT valor FROM contadores
+                             WHERE nombre = 'logs_auditoria') AS total_logs,
+                            (SELECT COUNT(*) FROM usuarios
+                             WHERE activo = 1) AS usuarios_activos,
+                            (SELECT COUNT(*) FROM logs_auditoria
+                             WHERE evento = 'CAMBIO_MODO'
+                             AND fecha >= DATE('now', 'localtime')
+                             AND fecha < DATE('now', 'localtime', '+1 day')) AS cambios_hoy
+                    ) AS t
+                    LEFT JOIN (
+                        SELECT nivel, COUNT(*) AS cantidad
+                        FROM logs_auditoria
+                        GROUP BY nivel
+                    ) AS n
+                ''').fetchall()
                 
+                total_logs, usuarios_activos, cambios_hoy = filas[0][:3]
                 return {
-                    'total_logs': total_logs,
+                    'total_logs': total_logs or 0,
                     'usuarios_activos': usuarios_activos,
-                    'eventos_nivel': eventos_nivel,
+                    'eventos_nivel': {
+                        fila['nivel']: fila['cantidad']
+                        for fila in filas if fila['nivel'] is not None
+                    },
                     'cambios_hoy': cambios_hoy
                 }
         except sqlite3.Error as e:
             logger.error(f"Error al obtener estadísticas: {e}")
             return {}
     
-    def obtener_actividad_por_usuario(self, limite: int = 10) -> List[Dict]:
+    def obtener_actividad_por_usuario(self, limite: int = 10) -> List[sqlite3.Row]:
         """Obtiene usuarios más activos"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT usuario, COUNT(*) as total_acciones,
@@ -526,34 +1188,34 @@ class DatabaseManager:
                     ORDER BY total_acciones DESC 
                     LIMIT ?
                 ''', (limite,))
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener actividad por usuario: {e}")
             return []
     
-    def obtener_eventos_por_dia(self, dias: int = 7) -> List[Dict]:
+    def obtener_eventos_por_dia(self, dias: int = 7) -> List[sqlite3.Row]:
         """Obtiene eventos agrupados por día"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT DATE(fecha) as dia, COUNT(*) as total_eventos,
                            SUM(CASE WHEN nivel = 'ERROR' THEN 1 ELSE 0 END) as errores,
                            SUM(CASE WHEN nivel = 'WARNING' THEN 1 ELSE 0 END) as warnings
                     FROM logs_auditoria 
-                    WHERE fecha >= datetime('now', '-' || ? || ' days')
+                    WHERE fecha >= datetime('now', 'localtime', ?)
                     GROUP BY DATE(fecha) 
                     ORDER BY dia ASC
-                ''', (dias,))
-                return [dict(row) for row in cursor.fetchall()]
+                ''', (f'-{int(dias)} days',))
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener eventos por día: {e}")
             return []
     
-    def obtener_cambios_modo_timeline(self, limite: int = 20) -> List[Dict]:
+    def obtener_cambios_modo_timeline(self, limite: int = 20) -> List[sqlite3.Row]:
         """Obtiene historial de cambios de modo"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT fecha, usuario, estado_previo, estado_nuevo, detalles
@@ -562,15 +1224,15 @@ class DatabaseManager:
                     ORDER BY fecha DESC 
                     LIMIT ?
                 ''', (limite,))
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener timeline de cambios: {e}")
             return []
     
-    def obtener_uso_por_modo(self) -> List[Dict]:
+    def obtener_uso_por_modo(self) -> List[sqlite3.Row]:
         """Obtiene estadísticas de uso por modo del auditorio"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT estado_nuevo as modo, COUNT(*) as total_usos,
@@ -580,17 +1242,17 @@ class DatabaseManager:
                     GROUP BY estado_nuevo
                     ORDER BY total_usos DESC
                 ''')
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener uso por modo: {e}")
             return []
     
     # ==================== CONFIGURACIONES ====================
     
-    def obtener_configuraciones(self, categoria: str = None) -> List[Dict]:
+    def obtener_configuraciones(self, categoria: str = None) -> List[sqlite3.Row]:
         """Obtiene configuraciones del sistema"""
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 
                 if categoria:
@@ -602,7 +1264,7 @@ class DatabaseManager:
                 else:
                     cursor.execute('SELECT * FROM configuraciones ORDER BY categoria, clave')
                 
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error al obtener configuraciones: {e}")
             return []
@@ -614,7 +1276,7 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE configuraciones 
-                    SET valor = ?, actualizado = CURRENT_TIMESTAMP, actualizado_por = ?
+                    SET valor = ?, actualizado = datetime('now', 'localtime'), actualizado_por = ?
                     WHERE clave = ?
                 ''', (valor, usuario, clave))
                 logger.info(f"Configuración actualizada: {clave} = {valor}")
@@ -624,19 +1286,31 @@ class DatabaseManager:
             return False
 
 
-    def obtener_estado(self) -> Dict[str, str]:
+    def obtener_estado(self, use_cache: bool = True) -> Dict[str, str]:
         """
         Obtiene el estado actual del sistema desde la base de datos.
         Esta función reemplaza el diccionario global en RAM.
+        Dentro de estado_ttl segundos se responde desde la caché en memoria,
+        que actualizar_estado mantiene al día en este proceso.
+        
+        Args:
+            use_cache: False para leer siempre desde la base de datos
         
         Returns:
-            Diccionario con el estado completo del sistema
+            Diccionario con el estado completo del sistema (copia)
         """
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT clave, valor FROM estado_sistema")
-                return dict(cursor.fetchall())
+            # La carga ocurre bajo el lock: una escritura concurrente no puede
+            # quedar pisada por una lectura anterior a ella
+            with self._estado_lock:
+                if (not use_cache or self._estado_cache is None
+                        or time.monotonic() - self._estado_ts >= self.estado_ttl):
+                    with self._get_lectura() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute(self._SQL_SELECT_ESTADO)
+                        self._estado_cache = dict(cursor.fetchall())
+                    self._estado_ts = time.monotonic()
+                return dict(self._estado_cache)
                 
         except sqlite3.Error as e:
             logger.error(f"Error al obtener estado: {e}")
@@ -650,6 +1324,8 @@ class DatabaseManager:
         """
         Actualiza el estado del sistema en la base de datos.
         Thread-safe: múltiples workers pueden llamar esta función sin conflictos.
+        Todas las claves van en un solo executemany dentro de una transacción
+        BEGIN IMMEDIATE, que toma el lock de escritura una sola vez.
         
         Args:
             estado: Diccionario con los valores a actualizar
@@ -660,23 +1336,25 @@ class DatabaseManager:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                cursor.executemany(self._SQL_UPSERT_ESTADO, estado.items())
                 
-                for clave, valor in estado.items():
-                    cursor.execute('''
-                        INSERT INTO estado_sistema (clave, valor, actualizado)
-                        VALUES (?, ?, ?)
-                        ON CONFLICT(clave) DO UPDATE SET 
-                            valor = excluded.valor,
-                            actualizado = excluded.actualizado
-                    ''', (clave, valor, now))
-                
-                logger.debug(f"Estado actualizado: {list(estado.keys())}")
-                return True
+            with self._estado_lock:
+                if self._estado_cache is not None:
+                    self._estado_cache.update(estado)
+                    self._estado_ts = time.monotonic()
+                
+            logger.debug(f"Estado actualizado: {list(estado.keys())}")
+            return True
                 
         except sqlite3.Error as e:
             logger.error(f"Error al actualizar estado: {e}")
+            self._invalidar_estado()
             return False
+    
+    def _invalidar_estado(self) -> None:
+        """Descarta la caché de estado; la próxima lectura va a la base de datos"""
+        with self._estado_lock:
+            self._estado_cache = None
 
     def obtener_estadisticas(self) -> Dict[str, int]:
         """
@@ -686,7 +1364,7 @@ class DatabaseManager:
             Diccionario con métricas del sistema
         """
         try:
-            with self._get_connection() as conn:
+            with self._get_lectura() as conn:
                 cursor = conn.cursor()
                 
                 # Total de eventos
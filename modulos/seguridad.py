@@ -0,0 +1,118 @@
+"""
+Capa de Seguridad - Verificación de credenciales
+Arquitectura: KDF lento (hash de contraseña) amortizado con caché LRU de verificaciones
+"""
+import bcrypt
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Union
+
+from werkzeug.security import check_password_hash
+
+# Configuración de logging
+logger = logging.getLogger(__name__)
+
+# Factor de costo por defecto de bcrypt (2^12 iteraciones)
+BCRYPT_ROUNDS = 12
+
+
+def generar_hash(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """
+    Genera el hash bcrypt de una contraseña.
+
+    Args:
+        password: Contraseña en claro
+        rounds: Factor de costo logarítmico de bcrypt
+
+    Returns:
+        Hash en formato modular ($2b$...) listo para guardar como TEXT
+    """
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def verificar_hash(password_hash: str, password: str) -> bool:
+    """
+    Verifica una contraseña contra su hash almacenado.
+    Los hashes bcrypt se verifican con la extensión nativa; los generados
+    previamente por werkzeug (pbkdf2/scrypt) siguen siendo válidos.
+    """
+    if password_hash.startswith('$2'):
+        try:
+            return bcrypt.checkpw(password.encode(), password_hash.encode())
+        except ValueError:
+            # Hash corrupto o con formato inválido
+            return False
+    return check_password_hash(password_hash, password)
+
+
+class CacheVerificacion:
+    """
+    Caché LRU con TTL de verificaciones de contraseña exitosas.
+    Evita repetir el KDF (decenas a cientos de ms) ante ráfagas de logins
+    del mismo usuario. Las claves son un HMAC del usuario, un digest de la
+    contraseña y el hash almacenado: nunca se guarda la contraseña en memoria
+    y un cambio de contraseña invalida la entrada automáticamente.
+    """
+
+    def __init__(self, secreto: Union[str, bytes], maxsize: int = 1024, ttl: float = 60.0):
+        """
+        Args:
+            secreto: Clave para el HMAC (normalmente SECRET_KEY de la aplicación)
+            maxsize: Número máximo de verificaciones retenidas
+            ttl: Segundos durante los que una verificación sigue siendo válida
+        """
+        self._secreto = secreto.encode() if isinstance(secreto, str) else secreto
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entradas: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _clave(self, username: str, password: str, password_hash: str) -> str:
+        """Deriva la clave de caché sin conservar la contraseña en claro"""
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        mensaje = f"{username}|{digest}|{password_hash}".encode()
+        return hmac.new(self._secreto, mensaje, hashlib.sha256).hexdigest()
+
+    def verificar(self, username: str, password: str, password_hash: str) -> bool:
+        """
+        Verifica una contraseña contra su hash, reutilizando verificaciones recientes.
+
+        Args:
+            username: Usuario que intenta autenticarse
+            password: Contraseña en claro recibida
+            password_hash: Hash almacenado en la base de datos
+
+        Returns:
+            True si la contraseña es correcta
+        """
+        clave = self._clave(username, password, password_hash)
+        ahora = time.monotonic()
+
+        with self._lock:
+            verificado = self._entradas.get(clave)
+            if verificado is not None:
+                if ahora - verificado < self.ttl:
+                    self._entradas.move_to_end(clave)
+                    return True
+                del self._entradas[clave]
+
+        # Sólo se cachean verificaciones exitosas
+        if not verificar_hash(password_hash, password):
+            return False
+
+        with self._lock:
+            self._entradas[clave] = ahora
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maxsize:
+                self._entradas.popitem(last=False)
+
+        return True
+
+    def limpiar(self) -> None:
+        """Descarta todas las verificaciones cacheadas"""
+        with self._lock:
+            self._entradas.clear()
@@ -0,0 +1,59 @@
+"""
+Serialización JSON - Proveedor orjson para Flask
+Arquitectura: Reemplazo del proveedor por defecto de Flask (jsonify, get_json, tojson)
+"""
+import sqlite3
+from typing import Any
+
+import orjson
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON respaldado por orjson.
+    Serializa de forma nativa datetime, date, UUID y dataclasses; el resto de
+    tipos (Decimal, sqlite3.Row, objetos con __html__) pasa por `default`.
+    Respeta `sort_keys` y `compact` igual que el proveedor de Flask, pero no
+    ordena las claves por defecto: se conserva el orden de inserción (el de las
+    columnas en las filas) y cada respuesta se ahorra el ordenamiento.
+    """
+
+    sort_keys = False
+
+    def _opciones(self, indentar: bool = False) -> int:
+        """Traduce los atributos del proveedor a flags de orjson"""
+        # Claves no textuales (int, date...) como las acepta json.dumps
+        opciones = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opciones |= orjson.OPT_INDENT_2
+        return opciones
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        """Convierte los tipos que orjson no soporta de forma nativa"""
+        if isinstance(o, sqlite3.Row):
+            return dict(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serializa a str (los argumentos de json.dumps se ignoran)"""
+        return orjson.dumps(obj, default=self.default, option=self._opciones()).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserializa desde str o bytes UTF-8"""
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Construye la respuesta directamente desde bytes, sin decodificar a str"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        cuerpo = orjson.dumps(
+            obj,
+            default=self.default,
+            option=self._opciones(indentar) | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
@@ -452,9 +452,9 @@ async function cargarConfiguraciones() {
                         <h4>${config.clave}</h4>
                         <p>${config.descripcion || 'Sin descripción'}</p>
                         <input type="${config.tipo === 'integer' ? 'number' : 'text'}" 
-                               id="config-${config.id}" 
+                               id="config-${config.clave}" 
                                value="${config.valor}">
-                        <button class="btn-primary" onclick="actualizarConfig('${config.clave}', 'config-${config.id}')">
+                        <button class="btn-primary" onclick="actualizarConfig('${config.clave}', 'config-${config.clave}')">
                             Guardar
                         </button>
                     </div>
@@ -0,0 +1,7 @@
+"""
+Punto de Entrada WSGI - Sistema de Control de Auditorio
+Uso en producción: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+
+__all__ = ['app']